@@ -0,0 +1,362 @@
+import argparse
+import csv
+import io
+import json
+import math
+import platform
+import statistics
+import sys
+import tracemalloc
+from ast import literal_eval
+from collections import namedtuple
+from contextlib import redirect_stdout
+from functools import cmp_to_key, partial
+from itertools import chain
+from pathlib import Path
+from time import perf_counter
+
+from generators import generate, generate_day15, generate_maze
+from utilities.runner import PartMarkers, day_context, import_day_module
+from utilities.timing import percentile
+
+root = Path(__file__).resolve().parent
+baseline_file = root / '.benchmark_baseline.json'
+
+
+class TimeProbe:
+    """Measures wall time of labelled segments, a segment ends where the next one begins"""
+    def __init__(self):
+        self.results = {}
+        self._start = None
+
+    def begin(self):
+        self._start = perf_counter()
+
+    def end(self, label):
+        elapsed = perf_counter() - self._start
+        self.results[label] = self.results.get(label, 0) + elapsed
+        self.begin()
+
+
+class MemoryProbe(TimeProbe):
+    """Measures peak memory allocated during labelled segments, tracemalloc must be tracing"""
+    def begin(self):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def end(self, label):
+        peak = tracemalloc.get_traced_memory()[1] - self._start
+        self.results[label] = max(self.results.get(label, 0), peak)
+        self.begin()
+
+
+def day_benchmark(script):
+    """Benchmark of a day main(), split by input file and part thanks to solve_problem outputs"""
+    def run(probe):
+        module = import_day_module(script)
+        current_file = None
+
+        def on_file(filename):
+            nonlocal current_file
+            current_file = filename
+            probe.begin()
+
+        def on_part(part):
+            probe.end(f'{current_file}:part{part}')
+
+        with day_context(script.parent), redirect_stdout(PartMarkers(on_file, on_part)):
+            module.main()
+    return run
+
+
+def day06_marker_benchmark(probe):
+    script = root / 'day06' / 'day06_perf.py'
+    module = import_day_module(script)
+    with day_context(script.parent), open('input.txt') as f:
+        datastream = f.read().strip()
+    for function in [module.find_marker_position, module.find_marker_position2,
+                     module.david_finds_the_marker_position, module.find_marker_position4]:
+        probe.begin()
+        function(datastream, marker_length=14)
+        probe.end(function.__name__)
+
+
+def day13_compare_benchmark(probe):
+    day13 = import_day_module(root / 'day13' / 'day13.py')
+    day13_compare = import_day_module(root / 'day13' / 'day13_compare.py')
+    with day_context(root / 'day13'), open('input.txt') as f:
+        packet_pairs = [tuple(literal_eval(line) for line in packet_pair_block.splitlines())
+                        for packet_pair_block in f.read().split('\n\n')]
+    compare = day13_compare.compare
+
+    probe.begin()
+    sum(i + 1 for i, (p1, p2) in enumerate(packet_pairs) if compare(p1, p2) <= 0)
+    sorted(chain(*packet_pairs), key=cmp_to_key(compare))
+    probe.end('compare')
+
+    probe.begin()
+    items = [tuple(day13.PacketItem.build(packet) for packet in pair) for pair in packet_pairs]
+    sum(i + 1 for i, (p1, p2) in enumerate(items) if p1 <= p2)
+    sorted(chain(*items))
+    probe.end('PacketItem')
+
+
+def day24_find_path_benchmark(probe):
+    day24 = import_day_module(root / 'day24' / 'day24.py')
+    for function, filename in [(day24.find_path_bfs, 'input.txt'),
+                               (day24.find_path_astar, 'input.txt'),
+                               (day24.find_path_dfs, 'test.txt')]:  # test input, as in earlier baselines
+        with day_context(root / 'day24'), open(filename) as f:
+            blizzards = f.read().splitlines()
+        start_position = blizzards[0].index('.') - 1 - 1j
+        exit_position = blizzards[-1].index('.') - 1 + (len(blizzards) - 2) * 1j
+        blizzards = day24.Blizzards([line.strip('#') for line in blizzards[1:-1]])
+        probe.begin()
+        function(blizzards, start_position, exit_position)
+        probe.end(f'{function.__name__}:{filename}')
+
+
+def jump_point_search_benchmark(probe):
+    """Plain A* vs jump point search, on a maze with loops and on an open field with scattered walls"""
+    from random import Random
+    from utilities.graph import WeightedSquareGrid
+
+    maze = generate_maze(301, Random(0)).splitlines()
+    rng = Random(0)
+    field = [''.join('#' if rng.random() < 0.05 else '.' for _ in range(400)) for _ in range(400)]
+    for name, lines in [('maze', maze), ('field', field)]:
+        grid = WeightedSquareGrid(len(lines[0]), len(lines))
+        grid.walls = {(x, y) for y, line in enumerate(lines) for x, char in enumerate(line) if char == '#'}
+        start, goal = (1, 1), (grid.width - 2, grid.height - 2)
+        grid.walls -= {start, goal}
+        costs = []
+        for jump_points in [False, True]:
+            probe.begin()
+            _, cost_so_far, _ = grid.a_star_search(start, goal, jump_points=jump_points)
+            probe.end(f"{name}:{'jump_points' if jump_points else 'a_star'}")
+            costs.append(cost_so_far.get(goal))
+        assert costs[0] == costs[1]
+
+
+def all_benchmarks():
+    benchmarks = {script.parent.name: day_benchmark(script) for script in sorted(root.glob('day*/day[0-9][0-9].py'))}
+    benchmarks.update({
+        'day06.find_marker_position': day06_marker_benchmark,
+        'day13.compare': day13_compare_benchmark,
+        'day24.find_path': day24_find_path_benchmark,
+        'graph.jump_point_search': jump_point_search_benchmark,
+    })
+    return benchmarks
+
+
+# Scaling cases time a solver over geometrically growing generated inputs.
+# prepare(size) returns the problem size n used for the fit and the call to time,
+# budget is the highest accepted exponent of the fitted time ~ n ** exponent.
+ScalingCase = namedtuple('ScalingCase', 'prepare, start, budget')
+
+
+def day12_shortest_path_case(size):
+    day12 = import_day_module(root / 'day12' / 'day12.py')
+    grid = day12.ElevationGrid([list(line) for line in generate(12, size).splitlines()])
+    start, end = day12.find_goals(grid)
+    return grid.width * grid.height, partial(day12.shortest_path, grid, start, end)
+
+
+def day15_distress_beacon_case(size):
+    # a small area, as the search scans the borders of all sensors but the last ones
+    from random import Random
+    day15 = import_day_module(root / 'day15' / 'day15.py')
+    sensors_data = [day15.decode_sensor(line) for line in generate_day15(size, Random(0), 4000).splitlines()]
+    return size, partial(day15.find_distress_beacon, sensors_data, 4000)
+
+
+def day15_scan_row_case(size):
+    day15 = import_day_module(root / 'day15' / 'day15.py')
+    sensors_data = [day15.decode_sensor(line) for line in generate(15, size).splitlines()]
+    return size, partial(day15.scan_row, sensors_data, 2_000_000)
+
+
+def day18_external_surface_case(size):
+    day18 = import_day_module(root / 'day18' / 'day18.py')
+    lava_droplet = {day18.Coordinate3(*map(int, line.split(','))) for line in generate(18, size).splitlines()}
+    return size, partial(day18.external_surface_area, lava_droplet)
+
+
+def day20_mix_case(size):
+    day20 = import_day_module(root / 'day20' / 'day20.py')
+    numbers = [int(line) for line in generate(20, size).splitlines()]
+    return size, partial(day20.mix, numbers)
+
+
+def day23_do_round_case(size):
+    day23 = import_day_module(root / 'day23' / 'day23.py')
+    elves = {complex(i, j) for j, line in enumerate(generate(23, size).splitlines())
+             for i, char in enumerate(line) if char == '#'}
+    return len(elves), lambda: day23.do_rounds(set(elves), rounds=10)
+
+
+scaling_cases = {
+    'day12.shortest_path': ScalingCase(day12_shortest_path_case, start=40, budget=1.3),
+    'day15.find_distress_beacon': ScalingCase(day15_distress_beacon_case, start=8, budget=1.3),
+    'day15.scan_row': ScalingCase(day15_scan_row_case, start=1000, budget=1.3),
+    'day18.external_surface_area': ScalingCase(day18_external_surface_case, start=250, budget=1.5),
+    'day20.mix': ScalingCase(day20_mix_case, start=250, budget=2.2),
+    'day23.do_round': ScalingCase(day23_do_round_case, start=16, budget=1.3),
+}
+
+
+def fit_exponent(points):
+    """Slope of the least squares line through log(time) vs log(n)"""
+    slope, _ = statistics.linear_regression([math.log(n) for n, _ in points], [math.log(t) for _, t in points])
+    return slope
+
+
+def measure_scaling(case, rounds, point_count, factor=2):
+    """List of (n, min time) for geometrically growing sizes"""
+    points = []
+    with redirect_stdout(io.StringIO()):
+        for size in (round(case.start * factor ** k) for k in range(point_count)):
+            n, call = case.prepare(size)
+            samples = []
+            for _ in range(rounds):
+                start = perf_counter()
+                call()
+                samples.append(perf_counter() - start)
+            points.append((n, min(samples)))
+    return points
+
+
+def run_scaling(names, rounds, point_count, csv_filename=None):
+    cases = {name: case for name, case in scaling_cases.items()
+             if not names or any(name.startswith(prefix) for prefix in names)}
+    rows = []
+    failures = 0
+    print(f"{'Solver':<30} {'exponent':>8} {'budget':>6}  points (n: seconds)")
+    for name, case in cases.items():
+        points = measure_scaling(case, rounds, point_count)
+        exponent = fit_exponent(points)
+        over_budget = exponent > case.budget
+        failures += over_budget
+        print(f"{name:<30} {exponent:8.2f} {case.budget:6.2f}  "
+              f"{'  '.join(f'{n}: {t:.4f}' for n, t in points)}{'  OVER BUDGET' if over_budget else ''}")
+        rows.extend({'solver': name, 'n': n, 'seconds': t, 'exponent': exponent, 'budget': case.budget}
+                    for n, t in points)
+    if csv_filename:
+        with open(csv_filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['solver', 'n', 'seconds', 'exponent', 'budget'])
+            writer.writeheader()
+            writer.writerows(rows)
+    if failures:
+        print(f'{failures} solver(s) scaling beyond their budget')
+    return 1 if failures else 0
+
+
+def measure(benchmark, rounds, memory=True):
+    samples = {}
+    with redirect_stdout(io.StringIO()):  # solutions are talkative
+        for _ in range(rounds):
+            probe = TimeProbe()
+            benchmark(probe)
+            for label, elapsed in probe.results.items():
+                samples.setdefault(label, []).append(elapsed)
+
+        peaks = {}
+        if memory:  # separate round, as tracing slows everything down
+            probe = MemoryProbe()
+            tracemalloc.start()
+            try:
+                benchmark(probe)
+            finally:
+                tracemalloc.stop()
+            peaks = probe.results
+
+    return {label: {'rounds': len(values),
+                    'min': min(values),
+                    'median': statistics.median(values),
+                    'p95': percentile(values, 95),
+                    'peak_memory': peaks.get(label)}
+            for label, values in samples.items()}
+
+
+def load_baseline(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)['results']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(filename, results, rounds):
+    with open(filename, 'w') as f:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'rounds': rounds,
+                   'results': results}, f, indent=2, sort_keys=True)
+
+
+def regressions(result, reference, threshold, min_time):
+    """List of regression descriptions of a result against its baseline reference"""
+    found = []
+    if reference is None:
+        return found
+    if (result['median'] > reference['median'] * (1 + threshold)
+            and result['median'] - reference['median'] > min_time):
+        found.append(f"time {result['median'] / reference['median'] - 1:+.0%}")
+    if (result['peak_memory'] is not None and reference.get('peak_memory')
+            and result['peak_memory'] > reference['peak_memory'] * (1 + threshold)):
+        found.append(f"memory {result['peak_memory'] / reference['peak_memory'] - 1:+.0%}")
+    return found
+
+
+def print_result(name, result, reference, flags):
+    peak = '' if result['peak_memory'] is None else f"{result['peak_memory'] / 1024:10.0f} KiB"
+    change = '' if reference is None else f"{result['median'] / reference['median'] - 1:+7.1%}"
+    print(f"{name:<40} {result['min']:9.4f} {result['median']:9.4f} {result['p95']:9.4f} s "
+          f"{peak:>14} {change:>8} {'REGRESSION ' + ', '.join(flags) if flags else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark all days parts and alternative implementations')
+    parser.add_argument('-n', '--rounds', type=int, default=3, help='timed rounds per benchmark')
+    parser.add_argument('-b', '--baseline', type=Path, default=baseline_file, help='baseline JSON file')
+    parser.add_argument('-s', '--save', action='store_true',
+                        help='save results as the new baseline (done anyway when there is none)')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='relative slowdown (or memory growth) flagged as a regression')
+    parser.add_argument('--min-time', type=float, default=0.001,
+                        help='absolute slowdown in seconds below which no regression is flagged')
+    parser.add_argument('--no-memory', action='store_true', help="don't measure peak memory")
+    parser.add_argument('--scaling', action='store_true',
+                        help='fit the empirical complexity of solvers over growing generated inputs instead')
+    parser.add_argument('--points', type=int, default=5, help='number of doubling sizes per scaling case')
+    parser.add_argument('--csv', type=Path, help='scaling points CSV file')
+    parser.add_argument('names', nargs='*', help='benchmark name prefixes (default: all)')
+    args = parser.parse_args()
+
+    if args.scaling:
+        return run_scaling(args.names, args.rounds, args.points, args.csv)
+
+    benchmarks = {name: benchmark for name, benchmark in all_benchmarks().items()
+                  if not args.names or any(name.startswith(prefix) for prefix in args.names)}
+    baseline = load_baseline(args.baseline)
+
+    print(f"{'Benchmark':<40} {'min':>9} {'median':>9} {'p95':>9}   {'peak memory':>14} {'change':>8}")
+    results = {}
+    regression_count = 0
+    for name, benchmark in benchmarks.items():
+        for label, result in measure(benchmark, args.rounds, not args.no_memory).items():
+            key = f'{name}:{label}'
+            reference = baseline.get(key)
+            flags = regressions(result, reference, args.threshold, args.min_time)
+            regression_count += bool(flags)
+            print_result(key, result, reference, flags)
+            results[key] = result
+
+    if args.save or not baseline:
+        save_baseline(args.baseline, {**baseline, **results}, args.rounds)
+        print(f'Baseline saved to {args.baseline}')
+    if regression_count:
+        print(f'{regression_count} regression(s) beyond {args.threshold:.0%}')
+    return 1 if regression_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
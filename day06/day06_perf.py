@@ -4,7 +4,7 @@ from day06 import find_marker_position, sliding_window
 from utilities.timing import timeit
 
 
-@timeit(rounds=500, verbose=False)
+@timeit(warmup=10, rounds=100, target_ci=0.01, max_rounds=1000)
 def measure_function(f, *args, **kwargs):
     f(*args, **kwargs)
 
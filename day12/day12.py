@@ -6,6 +6,8 @@ from utilities.graph import GridLocation, SquareGrid
 
 
 class ElevationGrid(SquareGrid):
+    directed = True  # moves depend on elevations
+
     def __init__(self, list_of_list):
         super().__init__(len(list_of_list[0]), len(list_of_list))
         self.data = list_of_list
@@ -29,6 +31,13 @@ class ElevationGrid(SquareGrid):
         results = filter(partial(self.can_move, location), results)
         return list(results)
 
+    def predecessors(self, location: GridLocation) -> List[GridLocation]:
+        x, y = location
+        predecessors = [(x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)]  # N E S W
+        results = filter(self.in_bounds, predecessors)
+        results = filter(lambda predecessor: self.can_move(predecessor, location), results)
+        return list(results)
+
 
 def find_goals(height_grid):
     start = 0, 0
@@ -63,8 +72,9 @@ def solve_problem(filename, expected1=None, expected2=None):
     if expected1 is not None:
         assert result1 == expected1
 
-    height_grid.can_move = height_grid.can_descend
-    result2 = shortest_path(height_grid, end, lambda location: height_grid.elevation(location) == 'a')
+    lowest_locations = [(x, y) for y, line in enumerate(height_grid.data) for x, elevation in enumerate(line)
+                        if elevation == 'a']
+    result2 = shortest_path(height_grid, lowest_locations, end)
     print(f"Part 2: shortest path length from any 'a' is {result2}")
     if expected2 is not None:
         assert result2 == expected2
@@ -3,11 +3,9 @@ from math import comb
 from collections import namedtuple, defaultdict
 from operator import itemgetter, xor
 
-from itertools import combinations
-
 from dataclasses import dataclass
 
-from utilities.graph import SimpleWeightedGraph
+from utilities.graph import SimpleWeightedGraph, contract
 from utilities.timing import timeit
 
 
@@ -23,23 +21,10 @@ class Valve:
         return f'{self.name}({self.rate})'
 
 
-def reduce_cave_graph(cave, start_valve):
-    valves_to_remove = set()
-    for valve, neighbors in cave.edges.items():
-        if valve.rate == 0 and valve != start_valve:
-            for (v1, d1), (v2, d2) in combinations(neighbors.items(), 2):
-                cave.add_edge(v1, v2, d1+d2)
-                cave.add_edge(v2, v1, d1 + d2)
-                del cave.edges[v1][valve], cave.edges[v2][valve]
-            valves_to_remove.add(valve)
-    for valve in valves_to_remove:
-        del cave.edges[valve]
-
-
 @timeit(verbose=True)
 def find_optimum_valve_opening(cave, start_valve, time_limit=30, valve_opening_time=1):
     # compute all shortest paths between any pair of valves
-    distances, paths = cave.floyd_warshall()
+    distances = cave.distance_matrix()
     minimum_travel_time = min(min(filter(lambda x: x > 0, d.values())) for d in distances.values())
 
     most_pressure = float("-inf")
@@ -59,9 +44,10 @@ def find_optimum_valve_opening(cave, start_valve, time_limit=30, valve_opening_t
         if elapsed_time >= time_limit - minimum_travel_time - valve_opening_time:
             return  # travelling + opening another valve would be useless
 
+        current_distances = distances[current_valve]
         for next_valve in remaining_valves:
             next_path = current_path + [next_valve]
-            next_elapsed_time = elapsed_time + distances[current_valve][next_valve] + valve_opening_time
+            next_elapsed_time = elapsed_time + current_distances[next_valve] + valve_opening_time
             next_pressure = current_pressure + next_valve.rate * (time_limit - next_elapsed_time)
             other_valves = [x for x in remaining_valves if x != next_valve]
             open_more_valves(other_valves, next_valve, next_path, next_pressure, next_elapsed_time)
@@ -150,7 +136,8 @@ def solve_problem(filename, expected1=None, expected2=None):
 
     start_valve = next(valve for valve in cave.nodes if valve.name == 'AA')
 
-    reduce_cave_graph(cave, start_valve)
+    # keep only valves worth opening, and the start
+    cave = contract(cave, keep=lambda valve: valve.rate > 0 or valve == start_valve)
     print(f'Cave problem reduced from {len(valve_data)} to {len(cave.nodes)} valves')
 
     result1, _, _ = find_optimum_valve_opening(cave, start_valve, time_limit=30)
@@ -2,7 +2,7 @@ import math
 
 import numpy as np
 
-from utilities.collections2 import Queue, PriorityQueue, Stack
+from utilities.graph import WeightedGraph, BranchAndBound
 from utilities.timing import timeit
 
 
@@ -50,70 +50,70 @@ class Blizzards:
         return self.no_blizzard_cells[self.configuration_at_time(time)]
 
 
+class Valley(WeightedGraph):
+    """Implicit graph of (position, blizzards configuration) states, each move or wait taking a minute.
+    As configurations repeat, a state reached again later can only lead to later arrivals."""
+    moves = [1 + 0j, 0 + 1j, -1 + 0j, 0 - 1j, 0 + 0j]  # last one means staying in place
+
+    def __init__(self, blizzards, start_position, exit_position):
+        self.blizzards = blizzards
+        self.start_position = start_position
+        self.exit_position = exit_position
+        self.open_cells = [set(cells) | {start_position, exit_position} for cells in blizzards.no_blizzard_cells]
+
+    def state_at_time(self, position, time):
+        return position, self.blizzards.configuration_at_time(time)
+
+    def neighbors(self, node):
+        position, configuration = node
+        next_configuration = self.blizzards.configuration_at_time(configuration + 1)
+        open_cells = self.open_cells[next_configuration]
+        return [(next_position, next_configuration) for next_position in (position + move for move in self.moves)
+                if next_position in open_cells]
+
+    def cost(self, from_node, to_node):
+        return 1
+
+    def is_exit(self, node):
+        return node[0] == self.exit_position
+
+
 @timeit()
 def find_path_bfs(blizzards, start_position, exit_position, start_time=0):
-    moves = [1 + 0j, 0 + 1j, -1 + 0j, 0 - 1j, 0 + 0j]  # last one means staying in place
-    visited_configurations = set()
-    positions_to_explore = Queue()
-    positions_to_explore.put((start_position, start_time))
-    came_from = {(start_position, start_time): None}
-    elapsed = None
-
-    while positions_to_explore:
-        current_position, minute = current_state = positions_to_explore.get()
-        if current_position == exit_position:
-            elapsed = minute - start_time
-            break
-
-        next_minute = minute + 1
-        next_configuration = blizzards.configuration_at_time(next_minute)
-        open_cells = blizzards.open_cells_at_time(next_minute)
-        for next_position in (current_position + move for move in moves):
-            next_state = (next_position, next_minute)
-            if ((next_position == start_position or next_position == exit_position or next_position in open_cells)
-                    and next_state not in came_from
-                    and (next_position, next_configuration) not in visited_configurations):
-                positions_to_explore.put(next_state)
-                came_from[next_state] = current_state
-
-        visited_configurations.add((current_position, blizzards.configuration_at_time(minute)))
-
-    return elapsed
+    valley = Valley(blizzards, start_position, exit_position)
+    start = valley.state_at_time(start_position, start_time)
+    came_from, reached = valley.breadth_first_search(start, valley.is_exit)
+    if reached is None:
+        return None
+    return len(valley.reconstruct_path(came_from, start, reached)) - 1
 
 
 @timeit()
 def find_path_dfs(blizzards, start_position, exit_position, start_time=0):
-    moves = [1 + 0j, 0 + 1j, -1 + 0j, 0 - 1j, 0 + 0j]  # last one means staying in place
-    visited_states = set()
-    visited_configurations = set()
-    positions_to_explore = Stack()
-    positions_to_explore.put((start_position, start_time))
-    best_time = 1e30
-
-    while positions_to_explore:
-        current_position, minute = current_state = positions_to_explore.get()
-        if current_state not in visited_states:
-
-            if current_position == exit_position and minute < best_time:
-                best_time = minute
-            next_minute = minute + 1
-            if next_minute > best_time:
-                continue
-
-            visited_states.add(current_state)
-            visited_configurations.add((current_position, blizzards.configuration_at_time(minute)))
-
-            next_configuration = blizzards.configuration_at_time(next_minute)
-            open_cells = blizzards.open_cells_at_time(next_minute)
-            for next_position in (current_position + move for move in moves):
-                next_state = (next_position, next_minute)
-                if ((next_position == start_position or next_position == exit_position or next_position in open_cells)
-                        and next_state not in visited_states
-                        and (next_position, next_configuration) not in visited_configurations):
-                    positions_to_explore.put(next_state)
-
-    elapsed = best_time - start_time
-    return elapsed
+    # branch and bound over (position, minute) states, a state being dominated by an earlier one
+    # at the same position with the same blizzards configuration
+    valley = Valley(blizzards, start_position, exit_position)
+
+    def successors(state):
+        position, minute = state
+        next_states = [(next_position, minute + 1)
+                       for next_position, _ in valley.neighbors(valley.state_at_time(position, minute))]
+        # closest to exit last, to be searched first and give an incumbent early
+        return sorted(next_states, key=lambda next_state: heuristic(next_state[0], exit_position), reverse=True)
+
+    def arrival(state):
+        position, minute = state
+        return minute if position == exit_position else math.inf
+
+    def earliest_arrival(state):
+        position, minute = state
+        return minute + heuristic(position, exit_position)
+
+    search = BranchAndBound(successors, arrival, earliest_arrival, maximize=False,
+                            dominates=lambda state, other: state[1] <= other[1],
+                            dominance_key=lambda state: valley.state_at_time(*state))
+    best_time, _ = search.search((start_position, start_time))
+    return best_time - start_time
 
 
 def heuristic(position, goal):
@@ -121,43 +121,13 @@ def heuristic(position, goal):
     return abs(delta.real) + abs(delta.imag)
 
 
-def complex_to_tuple(c: complex):
-    return c.real, c.imag  # because PriorityQueue needs element ordering relation
-
-
 @timeit()
 def find_path_astar(blizzards, start_position, exit_position, start_time=0):
-    moves = [1 + 0j, 0 + 1j, -1 + 0j, 0 - 1j, 0 + 0j]  # last one means staying in place
-    visited_configurations = set()
-    positions_to_explore = PriorityQueue()
-    positions_to_explore.put((complex_to_tuple(start_position), start_time), 0)
-    came_from = {(start_position, start_time): None}
-    cost_so_far = {start_position: start_time}
-    elapsed = None
-
-    while positions_to_explore:
-        current_position, minute = current_state = positions_to_explore.get()
-        current_position = complex(*current_position)
-        if current_position == exit_position:
-            elapsed = minute - start_time
-            break
-
-        next_minute = minute + 1
-        next_configuration = blizzards.configuration_at_time(next_minute)
-        open_cells = blizzards.open_cells_at_time(next_minute)
-        for next_position in (current_position + move for move in moves):
-            if (next_position == start_position or next_position == exit_position or next_position in open_cells) \
-                    and (next_position, next_configuration) not in visited_configurations:
-                next_state = (next_position, next_minute)
-                if next_state not in cost_so_far or next_minute < cost_so_far[next_state]:
-                    cost_so_far[next_state] = next_minute
-                    positions_to_explore.put((complex_to_tuple(next_position), next_minute),
-                                             next_minute + heuristic(next_position, exit_position))
-                    came_from[next_state] = current_state
-
-        visited_configurations.add((current_position, blizzards.configuration_at_time(minute)))
-
-    return elapsed
+    valley = Valley(blizzards, start_position, exit_position)
+    start = valley.state_at_time(start_position, start_time)
+    _, cost_so_far, reached = valley.a_star_search(start, valley.is_exit,
+                                                   lambda node, _: heuristic(node[0], exit_position))
+    return cost_so_far[reached] if reached is not None else None
 
 
 def solve_problem(filename, expected1=None, expected2=None, find_path=find_path_bfs):
@@ -187,7 +157,7 @@ def solve_problem(filename, expected1=None, expected2=None, find_path=find_path_
 def main():
     solve_problem('test.txt', 18, 54, find_path_astar)
     # solve_problem('input.txt', 228, 723, find_path_bfs)
-    # solve_problem('input.txt', 228, 723, find_path_dfs)  # Implementation doesn't work...
+    # solve_problem('input.txt', 228, 723, find_path_dfs)
     solve_problem('input.txt', 228, 723, find_path_astar)
 
 
@@ -0,0 +1,199 @@
+import argparse
+import random
+import string
+from itertools import chain, product
+
+
+# Synthetic puzzle inputs, in the same format as input.txt files, to stress solutions at chosen sizes.
+# Each generator takes a size and a random generator, and returns the input text.
+
+
+def generate_day01(size, rng):
+    """size elves carrying 1 to 15 food items"""
+    return '\n\n'.join('\n'.join(str(rng.randint(1000, 60000)) for _ in range(rng.randint(1, 15)))
+                       for _ in range(size)) + '\n'
+
+
+def generate_day06(size, rng):
+    """Datastream of size characters, the 14 distinct characters marker being at its end"""
+    alphabet = string.ascii_lowercase
+    stream = []
+    while len(stream) < size - 14:  # repeat characters often enough that no marker appears
+        stream.append(stream[-rng.randint(1, 3)] if len(stream) >= 3 else rng.choice(alphabet))
+    stream.extend(rng.sample(alphabet, 14))
+    return ''.join(stream) + '\n'
+
+
+def generate_day09(size, rng):
+    """size head moves"""
+    return ''.join(f'{rng.choice("UDLR")} {rng.randint(1, 20)}\n' for _ in range(size))
+
+
+def generate_day12(size, rng):
+    """Heightmap of size columns and size // 2 rows, climbing from S at left to E at right.
+    Top row rises one step at a time and always gives a path, other cells are randomly lowered."""
+    width, height = max(size, 27), max(size // 2, 2)
+    rows = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            elevation = min(25, x * 26 // width)
+            if y > 0:
+                elevation = max(0, elevation - rng.choice([0, 0, 0, 1, 2]))
+            row.append(chr(ord('a') + elevation))
+        rows.append(row)
+    rows[height // 2][0] = 'S'
+    rows[0][width - 1] = 'E'
+    return ''.join(''.join(row) + '\n' for row in rows)
+
+
+def generate_day15(size, rng, limit=4_000_000):
+    """size sensors (at least 8) leaving a hidden distress beacon as the only uncovered position. The last four
+    sensors surround it, just out of their reach. Other sensors stop short of it, their borders don't pass next to
+    it: four of them in the corners cover the area but near the beacon, the others are random."""
+    hidden = rng.randint(limit // 4, 3 * limit // 4), rng.randint(limit // 4, 3 * limit // 4)
+    near = rng.randint(limit // 64, limit // 16)  # distance of the last sensors, covering around the beacon
+    sensors = []
+    while len(sensors) < size - 8:
+        x, y = rng.randint(0, limit), rng.randint(0, limit)
+        if abs(x - hidden[0]) + abs(y - hidden[1]) > near + 1:  # leaving room to stop short of the beacon
+            sensors.append((x, y))
+    sensors += [(0, 0), (0, limit), (limit, 0), (limit, limit)]
+    rng.shuffle(sensors)
+    reaches = [abs(x - hidden[0]) + abs(y - hidden[1]) - rng.randint(2, near) for x, y in sensors]
+    for x, y in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
+        sensors.append((hidden[0] + x * near, hidden[1] + y * near))
+        reaches.append(2 * near - 1)
+    lines = []
+    for (x, y), reach in zip(sensors, reaches):
+        dx = rng.randint(-reach, reach)
+        dy = (reach - abs(dx)) * rng.choice([-1, 1])
+        lines.append(f'Sensor at x={x}, y={y}: closest beacon is at x={x + dx}, y={y + dy}\n')
+    return ''.join(lines)
+
+
+def valve_names(length=2):
+    for letters in product(string.ascii_uppercase, repeat=length):
+        if ''.join(letters) != 'AA':
+            yield ''.join(letters)
+
+
+def generate_day16(size, rng):
+    """size valves with a flow rate, plus AA, connected by a random tree plus size more tunnels.
+    Like in puzzle inputs, tunnels are corridors through 0 to 3 valves with no flow rate and two tunnels each.
+    Past the two letter names of puzzle inputs (around size 175), names get three letters."""
+    names = chain(rng.sample(list(valve_names()), 26 * 26 - 1), valve_names(3))
+    rooms = ['AA'] + [next(names) for _ in range(size)]
+    pairs = {frozenset((room, rooms[rng.randrange(i)])) for i, room in enumerate(rooms[1:], start=1)}
+    for _ in range(10 * size):  # bounded attempts, small sizes may not have that many pairs
+        if len(pairs) >= 2 * size:
+            break
+        pairs.add(frozenset(rng.sample(rooms, 2)))
+    tunnels = {room: [] for room in rooms}
+    for a, b in sorted(map(sorted, pairs)):
+        corridor = [a] + [next(names) for _ in range(rng.randint(0, 3))] + [b]
+        for v1, v2 in zip(corridor, corridor[1:]):
+            tunnels.setdefault(v1, []).append(v2)
+            tunnels.setdefault(v2, []).append(v1)
+    lines = []
+    for name, neighbors in rng.sample(sorted(tunnels.items()), len(tunnels)):
+        rate = rng.randint(3, 25) if name in rooms[1:] else 0
+        if len(neighbors) == 1:
+            lines.append(f'Valve {name} has flow rate={rate}; tunnel leads to valve {neighbors[0]}\n')
+        else:
+            lines.append(f"Valve {name} has flow rate={rate}; tunnels lead to valves {', '.join(neighbors)}\n")
+    return ''.join(lines)
+
+
+def generate_day18(size, rng):
+    """Lava droplet of size cubes grown from a random walk"""
+    cubes = {(10, 10, 10)}
+    current = (10, 10, 10)
+    while len(cubes) < size:
+        axis = rng.randrange(3)
+        step = rng.choice([-1, 1])
+        current = tuple(c + step if i == axis else c for i, c in enumerate(current))
+        current = tuple(min(max(c, 0), 3 * round(size ** (1 / 3)) + 20) for c in current)
+        cubes.add(current)
+    return ''.join(f'{x},{y},{z}\n' for x, y, z in rng.sample(sorted(cubes), len(cubes)))
+
+
+def generate_day19(size, rng):
+    """size blueprints with costs in the same ranges as puzzle inputs"""
+    return ''.join(f'Blueprint {i}: Each ore robot costs {rng.randint(2, 4)} ore. '
+                   f'Each clay robot costs {rng.randint(2, 4)} ore. '
+                   f'Each obsidian robot costs {rng.randint(2, 4)} ore and {rng.randint(5, 20)} clay. '
+                   f'Each geode robot costs {rng.randint(2, 4)} ore and {rng.randint(5, 20)} obsidian.\n'
+                   for i in range(1, size + 1))
+
+
+def generate_day20(size, rng):
+    """size numbers, a single one being 0"""
+    numbers = [rng.choice([-1, 1]) * rng.randint(1, 10_000) for _ in range(size - 1)]
+    numbers.insert(rng.randrange(size), 0)
+    return ''.join(f'{n}\n' for n in numbers)
+
+
+def generate_day23(size, rng, density=0.5):
+    """size x size field of elves"""
+    return ''.join(''.join('#' if rng.random() < density else '.' for _ in range(size)) + '\n' for _ in range(size))
+
+
+def generate_day24(size, rng, density=0.6):
+    """Valley of size x size // 4 cells, blizzards covering density of them.
+    Like in puzzle inputs, no vertical blizzard crosses entrance and exit columns."""
+    width, height = max(size, 4), max(size // 4, 3)
+    lines = ['#.' + '#' * width]
+    for _ in range(height):
+        row = []
+        for x in range(width):
+            winds = '<>^v' if 0 < x < width - 1 else '<>'
+            row.append(rng.choice(winds) if rng.random() < density else '.')
+        lines.append('#' + ''.join(row) + '#')
+    lines.append('#' * width + '.#')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_maze(size, rng, loops=0.05):
+    """size x size maze (rounded up to odd) of '#' walls and '.' cells, carved by a randomized depth first search,
+    then with a loops share of the remaining inner walls removed to offer alternative paths"""
+    size |= 1
+    cells = [['#'] * size for _ in range(size)]
+    cells[1][1] = '.'
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(x + dx, y + dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                     if 0 < x + dx < size - 1 and 0 < y + dy < size - 1 and cells[y + dy][x + dx] == '#']
+        if not unvisited:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(unvisited)
+        cells[(y + ny) // 2][(x + nx) // 2] = cells[ny][nx] = '.'
+        stack.append((nx, ny))
+    for y in range(1, size - 1):
+        for x in range(1, size - 1):
+            if cells[y][x] == '#' and rng.random() < loops:
+                cells[y][x] = '.'
+    return ''.join(''.join(row) + '\n' for row in cells)
+
+
+generators = {int(name[len('generate_day'):]): function
+              for name, function in dict(globals()).items() if name.startswith('generate_day')}
+
+
+def generate(day, size, seed=0):
+    return generators[day](size, random.Random(seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic puzzle input on standard output')
+    parser.add_argument('day', type=int, choices=sorted(generators))
+    parser.add_argument('size', type=int, help='problem size, see each generator')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.day, args.size, args.seed), end='')
+
+
+if __name__ == '__main__':
+    main()
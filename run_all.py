@@ -1,13 +1,216 @@
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from subprocess import run
+from subprocess import run, Popen, PIPE, STDOUT
+from time import perf_counter
+
+from utilities.profiling import Profile, MemoryTrace
+from utilities.result_cache import ResultCache
+from utilities.runner import run_in_process
+
+root = Path(__file__).resolve().parent
+timings_file = root / '.run_all_timings.json'
+cache_directory = root / '.run_cache'
+
+
+def discover_scripts():
+    return sorted(root.glob('day*/day*.py'))
+
+
+def script_name(script):
+    return script.relative_to(root).as_posix()
+
+
+def load_timings():
+    try:
+        with open(timings_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_timings(timings):
+    with open(timings_file, 'w') as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+
+
+def longest_first(scripts, timings):
+    # never timed scripts go first, as they may well be the slowest ones
+    return sorted(scripts, key=lambda script: timings.get(script_name(script), float('inf')), reverse=True)
+
+
+def child_environment():
+    # day scripts import utilities.* as if run from the repository root
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(root), env.get('PYTHONPATH')]))
+    return env
+
+
+def run_script(script, capture=True, echo=False):
+    """Run a day script in its own directory, returns (returncode, elapsed, output)
+    output is None when not captured, with echo it is also written to stdout as it comes"""
+    start = perf_counter()
+    if capture and echo:
+        env = child_environment()
+        env['PYTHONUNBUFFERED'] = '1'  # lines as soon as printed, not when a pipe buffer is full
+        lines = []
+        with Popen([sys.executable, script.name], cwd=script.parent, env=env, stdout=PIPE, stderr=STDOUT,
+                   text=True) as process:
+            for line in process.stdout:
+                print(line, end='', flush=True)
+                lines.append(line)
+        return process.returncode, perf_counter() - start, ''.join(lines)
+    completed = run([sys.executable, script.name], cwd=script.parent, env=child_environment(),
+                    stdout=PIPE if capture else None, stderr=STDOUT if capture else None, text=True)
+    elapsed = perf_counter() - start
+    return completed.returncode, elapsed, completed.stdout
+
+
+def cached_result(cache, script):
+    """(key, cached (elapsed, output) or None), all None without cache"""
+    if cache is None:
+        return None, None
+    key = cache.key(script)
+    return key, cache.get(key)
+
+
+def store_result(cache, key, returncode, elapsed, output):
+    if cache is not None and returncode == 0:
+        cache.put(key, elapsed, output)
+
+
+def run_serial(scripts, runner=run_script, keep_going=False, cache=None):
+    results = {}
+    for script in scripts:
+        key, cached = cached_result(cache, script)
+        if cached is not None:
+            elapsed, output = cached
+            print(f'========= {script} (cached)')
+            print(output)
+            results[script] = 0, elapsed, True
+            continue
+        print(f'========= Running {script}')
+        # output is only captured when it has to be stored, and shown live anyway
+        returncode, elapsed, output = runner(script, capture=cache is not None, echo=True)
+        print()
+        store_result(cache, key, returncode, elapsed, output)
+        results[script] = returncode, elapsed, False
+        if returncode != 0 and not keep_going:
+            break
+    return results
+
+
+def run_parallel(scripts, jobs, runner=run_script, cache=None):
+    # Threads are enough to drive child interpreters, in-process runs need worker processes
+    executor_class = ThreadPoolExecutor if runner is run_script else ProcessPoolExecutor
+    results = {}
+    keys = {}
+    to_run = []
+    for script in scripts:
+        keys[script], cached = cached_result(cache, script)
+        if cached is not None:
+            elapsed, output = cached
+            print(f'========= {script} (cached)')
+            print(output)
+            results[script] = 0, elapsed, True
+        else:
+            to_run.append(script)
+
+    with executor_class(max_workers=jobs) as executor:
+        futures = {executor.submit(runner, script): script for script in to_run}
+        for future in as_completed(futures):
+            script = futures[future]
+            returncode, elapsed, output = future.result()
+            store_result(cache, keys[script], returncode, elapsed, output)
+            results[script] = returncode, elapsed, False
+            print(f'========= {script} ({elapsed:.2f} s)')  # buffered block, never interleaved
+            print(output)
+    return results
+
+
+def print_report(scripts, results, wall_time):
+    width = max(len(script_name(script)) for script in scripts)
+    print(f"{'Script':<{width}}  Status  Time")
+    for script in sorted(scripts):
+        if script in results:
+            returncode, elapsed, cached = results[script]
+            status = 'pass' if returncode == 0 else 'FAIL'
+            print(f"{script_name(script):<{width}}  {status:<6}  {elapsed:7.2f} s{' (cached)' if cached else ''}")
+        else:
+            print(f"{script_name(script):<{width}}  {'skip':<6}")
+    passed = sum(returncode == 0 for returncode, _, _ in results.values())
+    failed = len(results) - passed
+    hits = sum(cached for _, _, cached in results.values())
+    cumulated = sum(elapsed for _, elapsed, cached in results.values() if not cached)
+    print(f'{passed} passed ({hits} from cache), {failed} failed, {len(scripts) - len(results)} skipped '
+          f'in {wall_time:.2f} s (cumulated script time {cumulated:.2f} s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run all day scripts')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of scripts run simultaneously, longest expected first')
+    parser.add_argument('-k', '--keep-going', action='store_true',
+                        help="don't stop at first failure (always the case with several jobs)")
+    parser.add_argument('-i', '--in-process', action='store_true',
+                        help='import day modules and call their main() instead of starting an interpreter per script')
+    parser.add_argument('-p', '--profile', action='store_true',
+                        help='profile each part of each day (implies --in-process)')
+    parser.add_argument('--profile-mode', choices=Profile.modes, default='cprofile',
+                        help='cProfile (exact, with .pstats) or sampling profiler (less overhead)')
+    parser.add_argument('--profile-dir', type=Path, default=root / 'profiles',
+                        help='where .pstats and .collapsed (flamegraph) files are written')
+    parser.add_argument('--profile-top', type=int, default=10, help='number of hot functions printed per part')
+    parser.add_argument('-m', '--memory', action='store_true',
+                        help='trace peak memory and top allocation sites of each part (implies --in-process)')
+    parser.add_argument('--memory-top', type=int, default=5, help='number of allocation sites printed per part')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='run scripts even when a result is cached for their source, imports and inputs')
+    parser.add_argument('--no-cache', action='store_true', help='neither read nor store cached results')
+    parser.add_argument('--cache-size', type=int, default=256, help='number of cached results kept')
+    parser.add_argument('scripts', nargs='*', help='day directories or scripts to run (default: all)')
+    args = parser.parse_args()
+
+    scripts = discover_scripts()
+    if args.scripts:
+        selected = [Path(s).resolve() for s in args.scripts]
+        scripts = [script for script in scripts
+                   if any(script == s or s in script.parents for s in selected)]
+        if not scripts:
+            parser.error(f"no day script matches {' '.join(args.scripts)}")
+
+    runner = run_in_process if args.in_process else run_script
+    instruments = []  # started in order and stopped in reverse, the profiler runs outside the memory trace
+    if args.profile:
+        instruments.append(partial(Profile, mode=args.profile_mode, output_dir=args.profile_dir, top=args.profile_top))
+    if args.memory:
+        instruments.append(partial(MemoryTrace, top=args.memory_top))
+    if instruments:
+        runner = partial(run_in_process, instruments=instruments)
+    # instrumented runs are wanted for their side outputs, never skip them
+    cache = None if args.no_cache or instruments else ResultCache(cache_directory, root, args.cache_size, args.force)
+
+    timings = load_timings()
+    start = perf_counter()
+    if args.jobs > 1:
+        results = run_parallel(longest_first(scripts, timings), args.jobs, runner, cache)
+    else:
+        results = run_serial(scripts, runner, args.keep_going, cache)
+    wall_time = perf_counter() - start
+    if cache is not None:
+        cache.prune()
+
+    timings.update({script_name(script): elapsed
+                    for script, (returncode, elapsed, cached) in results.items() if returncode == 0 and not cached})
+    save_timings(timings)
+
+    print_report(scripts, results, wall_time)
+    return 0 if all(returncode == 0 for returncode, _, _ in results.values()) else 1
 
-import sys
 
-root = Path.cwd()
-for script in root.glob('day*/day*.py'):
-    print(f'========= Running {script}')
-    path = Path(script)
-    completed = run([sys.executable, path.name], cwd=path.parent)
-    print()
-    if completed.returncode != 0:
-        break
+if __name__ == '__main__':
+    sys.exit(main())
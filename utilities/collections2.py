@@ -1,6 +1,7 @@
 import heapq
+import itertools
 
-from typing import TypeVar, List, Tuple
+from typing import TypeVar, List, Tuple, Dict
 
 import collections
 
@@ -63,3 +64,175 @@ class PriorityQueue:
 
     def get(self) -> T:
         return heapq.heappop(self.elements)[1]
+
+
+class IndexedPriorityQueue:
+    """Binary heap of unique items, indexed by item to support decrease_key and membership tests.
+    Items only need to be hashable, ties between equal priorities are broken by insertion order.
+    Putting an item already queued only lowers its priority, if the new one is lower."""
+    def __init__(self):
+        self.elements: List[Tuple[float, int, T]] = []  # (priority, insertion count, item)
+        self.positions: Dict[T, int] = {}
+        self._counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.elements)
+
+    def empty(self) -> bool:
+        return not self.elements
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __iter__(self):
+        return ((priority, item) for priority, _, item in self.elements)
+
+    def __contains__(self, item: T) -> bool:
+        return item in self.positions
+
+    def priority(self, item: T) -> float:
+        return self.elements[self.positions[item]][0]
+
+    def peek(self) -> Tuple[float, T]:
+        """(priority, item) of the next item to get"""
+        priority, _, item = self.elements[0]
+        return priority, item
+
+    def put(self, item: T, priority: float):
+        position = self.positions.get(item)
+        if position is None:
+            self.elements.append((priority, next(self._counter), item))
+            self._sift_up(len(self.elements) - 1)
+        elif priority < self.elements[position][0]:
+            self.decrease_key(item, priority)
+
+    def decrease_key(self, item: T, priority: float):
+        position = self.positions[item]
+        old_priority, count, _ = self.elements[position]
+        if priority > old_priority:
+            raise ValueError(f'Cannot increase priority of {item!r} from {old_priority} to {priority}')
+        self.elements[position] = (priority, count, item)
+        self._sift_up(position)
+
+    def get(self) -> T:
+        elements = self.elements
+        last = elements.pop()
+        if elements:
+            item = elements[0][2]
+            elements[0] = last
+            self._sift_down(0)
+        else:
+            item = last[2]
+        del self.positions[item]
+        return item
+
+    def _sift_up(self, position: int):
+        elements, positions = self.elements, self.positions
+        entry = elements[position]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = elements[parent_position]
+            if entry < parent:
+                elements[position] = parent
+                positions[parent[2]] = position
+                position = parent_position
+            else:
+                break
+        elements[position] = entry
+        positions[entry[2]] = position
+
+    def _sift_down(self, position: int):
+        elements, positions = self.elements, self.positions
+        size = len(elements)
+        entry = elements[position]
+        child_position = 2 * position + 1
+        while child_position < size:
+            right_position = child_position + 1
+            if right_position < size and elements[right_position] < elements[child_position]:
+                child_position = right_position
+            child = elements[child_position]
+            if child < entry:
+                elements[position] = child
+                positions[child[2]] = position
+                position = child_position
+                child_position = 2 * position + 1
+            else:
+                break
+        elements[position] = entry
+        positions[entry[2]] = position
+
+
+class BucketQueue:
+    """Dial's bucket queue for small non-negative integer priorities: put and get are O(1), besides skipping
+    empty buckets up to the next priority. Like PriorityQueue, an item put several times is queued several times.
+    Items of equal priority are got last in first out."""
+    def __init__(self):
+        self.buckets: List[List[T]] = []
+        self.current = 0  # no item has a lower priority
+        self.size = 0
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return ((priority, item) for priority, bucket in enumerate(self.buckets) for item in bucket)
+
+    def put(self, item: T, priority: int):
+        if priority != int(priority) or priority < 0:
+            raise ValueError(f'BucketQueue priorities must be non-negative integers, got {priority}')
+        priority = int(priority)
+        if priority >= len(self.buckets):
+            self.buckets.extend([] for _ in range(priority + 1 - len(self.buckets)))
+        self.buckets[priority].append(item)
+        self.current = min(self.current, priority)
+        self.size += 1
+
+    def get(self) -> T:
+        if not self.size:
+            raise IndexError('get from an empty BucketQueue')
+        buckets = self.buckets
+        while not buckets[self.current]:
+            self.current += 1
+        self.size -= 1
+        return buckets[self.current].pop()
+
+
+class TranspositionTable:
+    """Mapping of search states to values bounded to max_entries, dropping the least recently used entries.
+    Counts hits and misses of get."""
+    def __init__(self, max_entries=1_000_000):
+        self.entries: collections.OrderedDict = collections.OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entries = self.entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
@@ -7,15 +7,30 @@
 # Feel free to use this code in your own projects, including commercial projects
 # License: Apache v2.0 <http://www.apache.org/licenses/LICENSE-2.0.html>
 
-from typing import Protocol, Dict, List, Set, Tuple, TypeVar, Optional, Union, Callable
+from typing import Protocol, Dict, List, Set, Tuple, TypeVar, Optional, Union, Callable, Iterable
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, accumulate, count, repeat
 import collections
+import heapq
+import multiprocessing
+import os
 
-from utilities.collections2 import PriorityQueue, Stack, Queue
+try:
+    import numpy
+except ImportError:  # floyd_warshall_matrix falls back to pure Python rows
+    numpy = None
+
+from utilities.collections2 import IndexedPriorityQueue, BucketQueue, PriorityQueue, Stack, Queue, TranspositionTable
 
 Node = TypeVar('Node')
 
+_exhausted = object()  # end of neighbor iterators, None may be a node
+
 
 class Graph(Protocol):
+    directed = True  # undirected graphs set it to False to get neighbors as predecessors
 
     @property
     def nodes(self) -> Set[Node]:
@@ -24,58 +39,225 @@ class Graph(Protocol):
     def neighbors(self, node: Node) -> List[Node]:
         return list()
 
-    def depth_first_traversal(self, from_node: Node, visitor):
+    # Backward searches need predecessors: graphs overriding neighbors() must override it too, unless undirected
+    def predecessors(self, node: Node) -> List[Node]:
+        if self.directed:
+            raise NotImplementedError(f'{type(self).__name__} is directed and does not define predecessors')
+        return self.neighbors(node)
+
+    # Traversals stop as soon as the visitor returns a true value, and then return the node it was visiting
+
+    def depth_first_traversal(self, from_node: Node, visitor) -> Optional[Node]:
         stack = Stack()
         visited = set()
         stack.put(from_node)
         while stack:
             current = stack.get()
             if current not in visited:
-                visitor(current)  # TODO add stop behavior on visitor return value
+                if visitor(current):
+                    return current
                 visited.add(current)
                 for neighbor in self.neighbors(current):
                     if neighbor not in visited:
                         stack.put(neighbor)
+        return None
 
-    def breadth_first_traversal(self, from_node: Node, visitor):
+    def breadth_first_traversal(self, from_node: Node, visitor) -> Optional[Node]:
         queue = Queue()
         visited = set()
         visited.add(from_node)
-        visitor(from_node)  # TODO add stop behavior on visitor return value
+        if visitor(from_node):
+            return from_node
         queue.put(from_node)
         while queue:
             current = queue.get()
             for neighbor in self.neighbors(current):
                 if neighbor not in visited:
-                    visitor(neighbor)  # TODO add stop behavior on visitor return value
+                    if visitor(neighbor):
+                        return neighbor
                     visited.add(neighbor)
                     queue.put(neighbor)
+        return None
 
-    def breadth_first_search(self, start: Node, goal: Union[Node | Callable]):
-        queue = Queue()
-        queue.put(start)
-        came_from: Dict[Node, Optional[Node]] = {start: None}
-        result = None
+    @staticmethod
+    def goal_predicate(goal: Union[Node | Callable]) -> Callable[[Node], bool]:
         if callable(goal):
-            shall_break = goal
-        else:
-            def shall_break(node: Node):
-                return node == goal
+            return goal
+
+        def is_goal(node: Node):
+            return node == goal
+        return is_goal
 
-        current = start
+    @staticmethod
+    def several_starts(start: Union[Node, Iterable[Node]]) -> bool:
+        """Iterables hold several start nodes, except tuples (as grid locations are) and strings"""
+        return isinstance(start, collections.abc.Iterable) and not isinstance(start, (tuple, str, bytes))
+
+    @classmethod
+    def start_nodes(cls, start: Union[Node, Iterable[Node]]) -> List[Node]:
+        return list(start) if cls.several_starts(start) else [start]
+
+    def breadth_first_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable] = None):
+        """(came_from, reached goal or None), goal being a node, a predicate, or None to reach all nodes"""
+        shall_break = self.goal_predicate(goal)
+        starts = self.start_nodes(start)
+        came_from: Dict[Node, Optional[Node]] = dict.fromkeys(starts)
+        queue = Queue()
+        for node in starts:
+            if shall_break(node):
+                return came_from, node
+            queue.put(node)
         while queue:
             current: Node = queue.get()
-            if shall_break(current):
-                result = current
-                break
             for neighbor in self.neighbors(current):
                 if neighbor not in came_from:
-                    queue.put(neighbor)
                     came_from[neighbor] = current
-        return came_from, result
+                    if shall_break(neighbor):
+                        return came_from, neighbor
+                    queue.put(neighbor)
+        return came_from, None
+
+    def breadth_first_distances(self, start: Union[Node, Iterable[Node]]) -> Dict[Node, int]:
+        """Distance field: distances of all reachable nodes to the nearest start node"""
+        starts = self.start_nodes(start)
+        distances = dict.fromkeys(starts, 0)
+        frontier = starts
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for current in frontier:
+                for neighbor in self.neighbors(current):
+                    if neighbor not in distances:
+                        distances[neighbor] = distance
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances
+
+    def bidirectional_search(self, start: Node, goal: Node):
+        """BFS from start, and backward from goal through predecessors, until both frontiers meet"""
+        came_from: Dict[Node, Optional[Node]] = {start: None}
+        came_to: Dict[Node, Optional[Node]] = {goal: None}  # next node towards goal
+        distance_from = {start: 0}
+        distance_to = {goal: 0}
+        if start == goal:
+            return came_from, goal
+        forward, backward = [start], [goal]
+        while forward and backward:
+            if len(forward) <= len(backward):
+                forward, meeting = self._expand_layer(forward, self.neighbors, came_from, distance_from, distance_to)
+            else:
+                backward, meeting = self._expand_layer(backward, self.predecessors, came_to, distance_to, distance_from)
+            if meeting is not None:
+                self._join_paths(came_from, came_to, meeting)
+                return came_from, goal
+        return came_from, None
+
+    @staticmethod
+    def _expand_layer(frontier, next_nodes, parents, distances, other_distances):
+        """Next frontier, and the node joining both searches with the shortest path if any"""
+        next_frontier = []
+        meeting = None
+        shortest = float('inf')
+        for current in frontier:
+            distance = distances[current] + 1
+            for neighbor in next_nodes(current):
+                if neighbor not in parents:
+                    parents[neighbor] = current
+                    distances[neighbor] = distance
+                    next_frontier.append(neighbor)
+                    if neighbor in other_distances and distance + other_distances[neighbor] < shortest:
+                        shortest = distance + other_distances[neighbor]
+                        meeting = neighbor
+        return next_frontier, meeting
+
+    @staticmethod
+    def _join_paths(came_from, came_to, meeting):
+        """Extend came_from along the backward path from meeting to the goal"""
+        node = meeting
+        while came_to[node] is not None:
+            came_from[came_to[node]] = node
+            node = came_to[node]
+
+    # Depth first searches below only keep the current path in memory, plus an optional transposition table,
+    # any object with get(key, default), put(key, value) and clear() methods like a bounded TranspositionTable.
+    # It remembers nodes already searched, to cut the same subtrees reached again through other paths,
+    # and is cleared at each search.
+
+    def depth_limited_search(self, start: Node, goal: Union[Node | Callable], depth_limit: int,
+                             table: TranspositionTable = None) -> Optional[List[Node]]:
+        """Path from start to goal of at most depth_limit edges, or None"""
+        path, _ = self._depth_limited_search(start, self.goal_predicate(goal), depth_limit, table)
+        return path
+
+    def iterative_deepening_search(self, start: Node, goal: Union[Node | Callable], max_depth: int = None,
+                                   table: TranspositionTable = None) -> Optional[List[Node]]:
+        """Shortest path (in edges) from start to goal, by depth limited searches up to max_depth"""
+        is_goal = self.goal_predicate(goal)
+        depth_limit = 0
+        while max_depth is None or depth_limit <= max_depth:
+            path, cut = self._depth_limited_search(start, is_goal, depth_limit, table)
+            if path is not None or not cut:
+                return path
+            depth_limit += 1
+        return None
+
+    def _depth_limited_search(self, start, is_goal, depth_limit, table):
+        """(path or None, whether the depth limit cut the search), table mapping nodes to (depth below, cut)"""
+        if is_goal(start):
+            return [start], False
+        if table is not None:
+            table.clear()
+        path = [start]
+        on_path = {start}
+        frames = [[iter(self.neighbors(start)), False]]  # neighbors left to search, cut below
+        cut = False
+        while frames:
+            frame = frames[-1]
+            node = next(frame[0], _exhausted)
+            if node is _exhausted:
+                frames.pop()
+                on_path.discard(path[-1])
+                if table is not None:
+                    table.put(path[-1], (depth_limit - len(path) + 1, frame[1]))
+                path.pop()
+                if frames:
+                    frames[-1][1] = frames[-1][1] or frame[1]
+                else:
+                    cut = frame[1]
+                continue
+            if node in on_path:
+                continue
+            remaining = depth_limit - len(path)  # depth left below node
+            if remaining < 0:
+                frame[1] = True
+                continue
+            if is_goal(node):
+                return path + [node], False
+            if remaining == 0:
+                frame[1] = True
+                continue
+            if table is not None:
+                searched, searched_cut = table.get(node, (-1, False))
+                if searched >= remaining:
+                    frame[1] = frame[1] or searched_cut
+                    continue
+            path.append(node)
+            on_path.add(node)
+            frames.append([iter(self.neighbors(node)), False])
+        return None, cut
 
     @classmethod
     def reconstruct_path(cls, came_from: Dict[Node, Node], start: Node, goal: Node) -> Optional[List[Node]]:
+        """Path from start to goal, start being None or several start nodes to stop at any of them"""
+        if start is None or cls.several_starts(start):
+            if goal not in came_from:
+                return None
+            path = [goal]
+            while came_from[path[-1]] is not None:
+                path.append(came_from[path[-1]])
+            path.reverse()
+            return path
         current: Node = goal
         path: List[Node] = []
         while current != start:
@@ -96,17 +278,24 @@ def print_visitor(node):
 class WeightedGraph(Graph):
     def cost(self, from_node: Node, to_node: Node) -> float: pass
 
-    def dijkstra_search(self, start: Node, goal: Node):
-        # TODO add goal predicate support and goal return value, like in BFS
-        pqueue = PriorityQueue()
-        pqueue.put(start, 0)
-        came_from: Dict[Node, Optional[Node]] = {start: None}
-        cost_so_far: Dict[Node, float] = {start: 0}
+    # Priority queue classes of dijkstra_search and a_star_search, 'bucket' fitting small integer costs
+    queues = {'indexed': IndexedPriorityQueue, 'bucket': BucketQueue, 'heap': PriorityQueue}
+
+    def dijkstra_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable] = None,
+                        queue='indexed'):
+        """(came_from, cost_so_far, reached goal or None), goal being a node, a predicate, or None for all"""
+        shall_break = self.goal_predicate(goal)
+        starts = self.start_nodes(start)
+        pqueue = self.queues[queue]()
+        for node in starts:
+            pqueue.put(node, 0)
+        came_from: Dict[Node, Optional[Node]] = dict.fromkeys(starts)
+        cost_so_far: Dict[Node, float] = dict.fromkeys(starts, 0)
 
         while pqueue:
             current: Node = pqueue.get()
-            if current == goal:
-                break
+            if shall_break(current):
+                return came_from, cost_so_far, current
 
             for next_node in self.neighbors(current):
                 new_cost = cost_so_far[current] + self.cost(current, next_node)
@@ -116,19 +305,23 @@ class WeightedGraph(Graph):
                     pqueue.put(next_node, priority)
                     came_from[next_node] = current
 
-        return came_from, cost_so_far
+        return came_from, cost_so_far, None
 
-    def a_star_search(self, start: Node, goal: Node, heuristic=None):
-        # TODO add goal predicate support and goal return value, like in BFS
-        pqueue = PriorityQueue()
-        pqueue.put(start, 0)
-        came_from: Dict[Node, Optional[Node]] = {start: None}
-        cost_so_far: Dict[Node, float] = {start: 0}
+    def a_star_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable], heuristic=None,
+                      queue='indexed'):
+        """(came_from, cost_so_far, reached goal or None), heuristic being called with goal as given"""
+        shall_break = self.goal_predicate(goal)
+        starts = self.start_nodes(start)
+        pqueue = self.queues[queue]()
+        for node in starts:
+            pqueue.put(node, 0)
+        came_from: Dict[Node, Optional[Node]] = dict.fromkeys(starts)
+        cost_so_far: Dict[Node, float] = dict.fromkeys(starts, 0)
 
         while pqueue:
             current: Node = pqueue.get()
-            if current == goal:
-                break
+            if shall_break(current):
+                return came_from, cost_so_far, current
 
             for next_node in self.neighbors(current):
                 new_cost = cost_so_far[current] + self.cost(current, next_node)
@@ -140,7 +333,108 @@ class WeightedGraph(Graph):
                     pqueue.put(next_node, priority)
                     came_from[next_node] = current
 
-        return came_from, cost_so_far
+        return came_from, cost_so_far, None
+
+    def bidirectional_a_star_search(self, start: Node, goal: Node, heuristic=None):
+        """A* from start, and backward from goal through predecessors, until they meet"""
+        def potential(node: Node):
+            return (heuristic(node, goal) - heuristic(start, node)) / 2 if heuristic else 0
+
+        came_from: Dict[Node, Optional[Node]] = {start: None}
+        cost_so_far: Dict[Node, float] = {start: 0}
+        came_to: Dict[Node, Optional[Node]] = {goal: None}  # next node towards goal
+        cost_to: Dict[Node, float] = {goal: 0}
+        if start == goal:
+            return came_from, cost_so_far, goal
+        forward = IndexedPriorityQueue()
+        forward.put(start, potential(start))
+        backward = IndexedPriorityQueue()
+        backward.put(goal, -potential(goal))
+        shortest = float('inf')
+        meeting = None
+
+        while forward and backward and forward.peek()[0] + backward.peek()[0] < shortest:
+            if len(forward) <= len(backward):
+                current = forward.get()
+                for next_node in self.neighbors(current):
+                    new_cost = cost_so_far[current] + self.cost(current, next_node)
+                    if next_node not in cost_so_far or new_cost < cost_so_far[next_node]:
+                        cost_so_far[next_node] = new_cost
+                        came_from[next_node] = current
+                        forward.put(next_node, new_cost + potential(next_node))
+                        if next_node in cost_to and new_cost + cost_to[next_node] < shortest:
+                            shortest = new_cost + cost_to[next_node]
+                            meeting = next_node
+            else:
+                current = backward.get()
+                for previous_node in self.predecessors(current):
+                    new_cost = cost_to[current] + self.cost(previous_node, current)
+                    if previous_node not in cost_to or new_cost < cost_to[previous_node]:
+                        cost_to[previous_node] = new_cost
+                        came_to[previous_node] = current
+                        backward.put(previous_node, new_cost - potential(previous_node))
+                        if previous_node in cost_so_far and new_cost + cost_so_far[previous_node] < shortest:
+                            shortest = new_cost + cost_so_far[previous_node]
+                            meeting = previous_node
+
+        if meeting is None:
+            return came_from, cost_so_far, None
+        self._join_paths(came_from, came_to, meeting)
+        node = meeting
+        while node is not None:
+            cost_so_far[node] = shortest - cost_to[node]
+            node = came_to[node]
+        return came_from, cost_so_far, goal
+
+    def ida_star_search(self, start: Node, goal: Union[Node | Callable], heuristic=None, max_cost=float('inf'),
+                        table: TranspositionTable = None) -> Tuple[Optional[List[Node]], float]:
+        """Iterative deepening A*: (path, cost), or (None, inf) if goal costs more than max_cost"""
+        is_goal = self.goal_predicate(goal)
+        estimate = (lambda node: heuristic(node, goal)) if heuristic else (lambda node: 0)
+        bound = estimate(start)
+        while bound <= max_cost and bound != float('inf'):  # infinite bound: nothing was cut
+            path, cost, next_bound = self._cost_limited_search(start, is_goal, estimate, bound, table)
+            if path is not None:
+                return path, cost
+            bound = next_bound
+        return None, float('inf')
+
+    def _cost_limited_search(self, start, is_goal, estimate, bound, table):
+        """(path or None, its cost, smallest cost plus estimate beyond bound)"""
+        if is_goal(start):
+            return [start], 0, bound
+        if table is not None:
+            table.clear()
+        path = [start]
+        costs = [0]
+        on_path = {start}
+        iterators = [iter(self.neighbors(start))]
+        next_bound = float('inf')
+        while iterators:
+            node = next(iterators[-1], _exhausted)
+            if node is _exhausted:
+                iterators.pop()
+                on_path.discard(path.pop())
+                costs.pop()
+                continue
+            if node in on_path:
+                continue
+            cost = costs[-1] + self.cost(path[-1], node)
+            total = cost + estimate(node)
+            if total > bound:
+                next_bound = min(next_bound, total)
+                continue
+            if is_goal(node):
+                return path + [node], cost, next_bound
+            if table is not None:
+                if table.get(node, float('inf')) <= cost:
+                    continue
+                table.put(node, cost)
+            path.append(node)
+            costs.append(cost)
+            on_path.add(node)
+            iterators.append(iter(self.neighbors(node)))
+        return None, float('inf'), next_bound
 
     def floyd_warshall(self):
         # Distances is the result of the algorithm
@@ -183,6 +477,215 @@ class WeightedGraph(Graph):
 
         return distances, predecessors
 
+    def weighted_edges(self) -> Tuple[List[Node], List[Tuple[int, int, float]]]:
+        """Nodes, and edges as (from index, to index, weight), neighbors missing from nodes being added"""
+        graph_nodes = list(self.nodes)
+        nodes = list(graph_nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = []
+        for i, node in enumerate(graph_nodes):
+            for neighbor in self.neighbors(node):
+                if neighbor not in node_index:
+                    node_index[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+                edges.append((i, node_index[neighbor], self.cost(node, neighbor)))
+        return nodes, edges
+
+    def floyd_warshall_matrix(self, predecessors=False) -> 'DistanceMatrix':
+        """Floyd-Warshall into a DistanceMatrix, relaxing whole rows at once with numpy if available"""
+        nodes, edges = self.weighted_edges()
+        implementation = _floyd_warshall_numpy if numpy is not None else _floyd_warshall_rows
+        distances, _predecessors = implementation(len(nodes), edges, predecessors)
+        integral = all(isinstance(weight, int) for _, _, weight in edges)
+        return DistanceMatrix(nodes, distances, _predecessors, integral)
+
+    all_pairs_methods = ('auto', 'bfs', 'dijkstra', 'floyd_warshall')
+
+    def all_pairs_shortest_paths(self, method='auto', processes=None, predecessors=False,
+                                 density_threshold=0.1) -> 'DistanceMatrix':
+        """All pairs distances in a DistanceMatrix, by method 'bfs', 'dijkstra' or 'floyd_warshall'"""
+        if method not in self.all_pairs_methods:
+            raise ValueError(f'Unknown method {method}, expecting one of {self.all_pairs_methods}')
+        nodes, edges = self.weighted_edges()
+        size = len(nodes)
+        if method == 'auto':
+            if all(weight == 1 for _, _, weight in edges):
+                method = 'bfs'
+            elif len(edges) < density_threshold * size * (size - 1):
+                method = 'dijkstra'
+            else:
+                method = 'floyd_warshall'
+        if method == 'floyd_warshall':
+            return self.floyd_warshall_matrix(predecessors)
+
+        adjacency = [[] for _ in range(size)]
+        for i, j, weight in edges:
+            adjacency[i].append((j, weight))
+        search = _single_source_bfs if method == 'bfs' else _single_source_dijkstra
+        if processes:
+            with ProcessPoolExecutor(processes, initializer=_share_adjacency, initargs=(adjacency,)) as executor:
+                rows = list(executor.map(search, range(size), chunksize=max(1, size // (4 * processes))))
+        else:
+            rows = [search(source, adjacency) for source in range(size)]
+        integral = method == 'bfs' or all(isinstance(weight, int) for _, _, weight in edges)
+        return DistanceMatrix(nodes, array('d', chain.from_iterable(distances for distances, _ in rows)),
+                              array('q', chain.from_iterable(p for _, p in rows)) if predecessors else None,
+                              integral)
+
+
+# Adjacency lists of (neighbor index, weight) of all pairs searches, shared once with each pool process
+_shared_adjacency = None
+
+
+def _share_adjacency(adjacency):
+    global _shared_adjacency
+    _shared_adjacency = adjacency
+
+
+def _single_source_bfs(source, adjacency=None):
+    """(distances, predecessors) lists from a source index, for unit weights"""
+    adjacency = adjacency if adjacency is not None else _shared_adjacency
+    inf = float('inf')
+    distances = [inf] * len(adjacency)
+    predecessors = [-1] * len(adjacency)
+    distances[source] = 0
+    frontier = [source]
+    for current in frontier:  # the list grows while iterating, it's the queue
+        distance = distances[current] + 1
+        for neighbor, _ in adjacency[current]:
+            if distances[neighbor] == inf:
+                distances[neighbor] = distance
+                predecessors[neighbor] = current
+                frontier.append(neighbor)
+    return distances, predecessors
+
+
+def _single_source_dijkstra(source, adjacency=None):
+    """(distances, predecessors) lists from a source index"""
+    adjacency = adjacency if adjacency is not None else _shared_adjacency
+    distances = [float('inf')] * len(adjacency)
+    predecessors = [-1] * len(adjacency)
+    distances[source] = 0
+    pqueue = [(0, source)]
+    while pqueue:
+        distance, current = heapq.heappop(pqueue)
+        if distance > distances[current]:
+            continue  # already settled through a shorter path
+        for neighbor, weight in adjacency[current]:
+            new_distance = distance + weight
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = current
+                heapq.heappush(pqueue, (new_distance, neighbor))
+    return distances, predecessors
+
+
+def _floyd_warshall_numpy(size, edges, with_predecessors):
+    distances = numpy.full((size, size), numpy.inf)
+    numpy.fill_diagonal(distances, 0)
+    predecessors = numpy.full((size, size), -1) if with_predecessors else None
+    for i, j, weight in edges:
+        if i == j:
+            continue  # staying is free
+        distances[i, j] = weight
+        if with_predecessors:
+            predecessors[i, j] = i
+
+    for k in range(size):
+        through_k = distances[:, k, None] + distances[k]
+        if with_predecessors:
+            predecessors = numpy.where(through_k < distances, predecessors[k], predecessors)
+        numpy.minimum(distances, through_k, out=distances)
+    return distances.ravel(), predecessors.ravel() if with_predecessors else None
+
+
+def _floyd_warshall_rows(size, edges, with_predecessors):
+    # Row by row over lists, with local rows and skipped unreachable rows: without numpy, element-wise
+    # broadcasting with map(min, ...) over arrays measures slower than this plain loop
+    inf = float('inf')
+    distances = [[inf] * size for _ in range(size)]
+    predecessors = [[-1] * size for _ in range(size)] if with_predecessors else None
+    for i in range(size):
+        distances[i][i] = 0
+    for i, j, weight in edges:
+        if i == j:
+            continue  # staying is free
+        distances[i][j] = weight
+        if with_predecessors:
+            predecessors[i][j] = i
+
+    for k in range(size):
+        row_k = distances[k]
+        predecessors_k = predecessors[k] if with_predecessors else None
+        for i in range(size):
+            row_i = distances[i]
+            distance_ik = row_i[k]
+            if distance_ik == inf:
+                continue
+            for j in range(size):
+                potential_new_distance = distance_ik + row_k[j]
+                if potential_new_distance < row_i[j]:
+                    row_i[j] = potential_new_distance
+                    if with_predecessors:
+                        predecessors[i][j] = predecessors_k[j]
+    return (array('d', (distance for row in distances for distance in row)),
+            array('q', (k for row in predecessors for k in row)) if with_predecessors else None)
+
+
+class DistanceMatrix(Mapping):
+    """All pairs distances in a flat row major buffer, read like floyd_warshall dicts: matrix[a][b]"""
+    def __init__(self, nodes: List[Node], distances, predecessors=None, integral=False):
+        self.nodes = nodes
+        self.index: Dict[Node, int] = {node: i for i, node in enumerate(nodes)}
+        self.distances = distances
+        self.predecessors = predecessors  # node indices, -1 for none
+        self.integral = integral
+        self._rows: Dict[Node, Dict[Node, float]] = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def row_values(self, i: int) -> list:
+        size = len(self.nodes)
+        values = self.distances[i * size:(i + 1) * size].tolist()
+        if self.integral:
+            values = [int(value) if value != float('inf') else value for value in values]
+        return values
+
+    def __getitem__(self, node: Node) -> Dict[Node, float]:
+        row = self._rows.get(node)
+        if row is None:
+            row = self._rows[node] = dict(zip(self.nodes, self.row_values(self.index[node])))
+        return row
+
+    def distance(self, from_node: Node, to_node: Node):
+        return self[from_node][to_node]
+
+    def path(self, from_node: Node, to_node: Node) -> Optional[List[Node]]:
+        size = len(self.nodes)
+        i, j = self.index[from_node], self.index[to_node]
+        path = [j]
+        while j != i:
+            j = int(self.predecessors[i * size + j])
+            if j < 0:
+                return None
+            path.append(j)
+        return [self.nodes[k] for k in reversed(path)]
+
+    def to_dicts(self):
+        """(distances, predecessors) dicts of dicts like floyd_warshall, predecessors being None if not computed"""
+        size = len(self.nodes)
+        distances = {node: dict(zip(self.nodes, self.row_values(i))) for i, node in enumerate(self.nodes)}
+        predecessors = None
+        if self.predecessors is not None:
+            predecessors = {node: {to_node: self.nodes[k] if k >= 0 else None for to_node, k in
+                                   zip(self.nodes, self.predecessors[i * size:(i + 1) * size].tolist())}
+                            for i, node in enumerate(self.nodes)}
+        return distances, predecessors
+
 
 class SimpleGraph(Graph):
     def __init__(self, directed=True):
@@ -205,32 +708,389 @@ class SimpleGraph(Graph):
     def neighbors(self, node: Node) -> List[Node]:
         return self.edges.get(node, list())
 
+    def predecessors(self, node: Node) -> List[Node]:
+        """Scans all edges of directed graphs"""
+        if not self.directed:
+            return self.neighbors(node)
+        return [other for other, neighbors in self.edges.items() if node in neighbors]
+
 
 class SimpleWeightedGraph(WeightedGraph):
     def __init__(self, directed=True):
         self.edges: Dict[Node, Dict[Node, float]] = collections.defaultdict(lambda: collections.defaultdict(float))
         self.directed = directed
+        self.listeners = []  # notified of edge changes made by add_edge and remove_edge, see DynamicShortestPaths
 
     @property
     def nodes(self):
         return self.edges.keys()
 
+    def _set_edge(self, node1, node2, weight):
+        old_weight = self.edges[node1].pop(node2, None)
+        if weight is not None:
+            self.edges[node1][node2] = weight
+        for listener in self.listeners:
+            listener.edge_changed(node1, node2, old_weight, weight)
+
     def add_edge(self, node1, node2, weight):
-        self.edges[node1][node2] = weight
+        self._set_edge(node1, node2, weight)
+        if not self.directed:
+            self._set_edge(node2, node1, weight)
+
+    def remove_edge(self, node1, node2):
+        self._set_edge(node1, node2, None)
         if not self.directed:
-            self.edges[node2][node1] = weight
+            self._set_edge(node2, node1, None)
 
     def neighbors(self, node: Node) -> List[Node]:
         return list(self.edges[node].keys())
 
+    def predecessors(self, node: Node) -> List[Node]:
+        """Scans all edges of directed graphs"""
+        if not self.directed:
+            return self.neighbors(node)
+        return [other for other, neighbors in self.edges.items() if node in neighbors]
+
     def cost(self, from_node: Node, to_node: Node) -> float:
         return self.edges[from_node][to_node]
 
 
+class DynamicShortestPaths:
+    """All pairs shortest distances of graph, updated by its add_edge and remove_edge only"""
+    def __init__(self, graph: SimpleWeightedGraph):
+        self.graph = graph
+        matrix = graph.all_pairs_shortest_paths()
+        self.nodes: List[Node] = list(matrix.nodes)
+        self.index: Dict[Node, int] = dict(matrix.index)
+        self.distances: List[List[float]] = [matrix.row_values(i) for i in range(len(self.nodes))]
+        graph.listeners.append(self)
+
+    def detach(self):
+        self.graph.listeners.remove(self)
+
+    def distance(self, from_node: Node, to_node: Node) -> float:
+        return self.distances[self.index[from_node]][self.index[to_node]]
+
+    def __getitem__(self, node: Node) -> Dict[Node, float]:
+        return dict(zip(self.nodes, self.distances[self.index[node]]))
+
+    def _add_node(self, node: Node):
+        self.index[node] = len(self.nodes)
+        self.nodes.append(node)
+        inf = float('inf')
+        for row in self.distances:
+            row.append(inf)
+        self.distances.append([inf] * len(self.nodes))
+        self.distances[-1][-1] = 0
+
+    def edge_changed(self, from_node: Node, to_node: Node, old_weight: Optional[float], new_weight: Optional[float]):
+        """Weights are None for missing edges"""
+        for node in (from_node, to_node):
+            if node not in self.index:
+                self._add_node(node)
+        u, v = self.index[from_node], self.index[to_node]
+        if new_weight is not None and (old_weight is None or new_weight < old_weight):
+            self._decrease(u, v, new_weight)
+        elif old_weight is not None and (new_weight is None or new_weight > old_weight):
+            self._increase(u, v, old_weight)
+
+    def _decrease(self, u: int, v: int, weight: float):
+        row_v = self.distances[v]
+        for row in self.distances:
+            through = row[u] + weight
+            if through < row[v]:  # else no path through the edge can be shorter than the current ones
+                for j, distance_vj in enumerate(row_v):
+                    if through + distance_vj < row[j]:
+                        row[j] = through + distance_vj
+
+    def _increase(self, u: int, v: int, old_weight: float):
+        sources = [i for i, row in enumerate(self.distances)
+                   if row[v] != float('inf') and row[u] + old_weight <= row[v] * (1 + 1e-12)]
+        if not sources:
+            return
+        for node, neighbors in list(self.graph.edges.items()):  # edges is a defaultdict, reads add empty nodes
+            for other in chain((node,), neighbors):
+                if other not in self.index:
+                    self._add_node(other)
+        adjacency = [[] for _ in self.nodes]
+        for node, neighbors in self.graph.edges.items():
+            adjacency[self.index[node]].extend((self.index[neighbor], weight) for neighbor, weight in neighbors.items())
+        for i in sources:
+            self.distances[i] = _single_source_dijkstra(i, adjacency)[0]
+
+
+class CSRGraph(Graph):
+    """Frozen graph in compressed sparse row layout: neighbors of index i are targets[offsets[i]:offsets[i + 1]]"""
+    def __init__(self, nodes: List[Node], offsets: array, targets: array):
+        self._nodes = list(nodes)
+        self.index: Dict[Node, int] = {node: i for i, node in enumerate(self._nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self._reversed = None
+
+    @staticmethod
+    def _index_graph(graph: Graph):
+        """nodes, offsets, targets and edges (from, to) of any graph, neighbors missing from nodes being added"""
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        node_count = len(nodes)
+        offsets, targets = array('l', [0]), array('l')
+        edges = []
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            for neighbor in graph.neighbors(node) if i < node_count else ():
+                if neighbor not in index:
+                    index[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+                targets.append(index[neighbor])
+                edges.append((node, neighbor))
+            offsets.append(len(targets))
+            i += 1
+        return nodes, offsets, targets, edges
+
+    @classmethod
+    def from_graph(cls, graph: Graph):
+        nodes, offsets, targets, _ = cls._index_graph(graph)
+        return cls(nodes, offsets, targets)
+
+    @property
+    def nodes(self) -> List[Node]:
+        return self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def neighbor_indices(self, i: int) -> array:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def neighbors(self, node: Node) -> List[Node]:
+        i = self.index.get(node)
+        if i is None:
+            return []
+        return [self._nodes[j] for j in self.targets[self.offsets[i]:self.offsets[i + 1]]]
+
+    def reversed_arrays(self) -> Tuple[array, array]:
+        """offsets and sources of the reversed graph, built once"""
+        if self._reversed is None:
+            counts = [0] * (len(self._nodes) + 1)
+            for j in self.targets:
+                counts[j + 1] += 1
+            offsets = array('l', accumulate(counts))
+            sources = array('l', [0]) * len(self.targets)
+            next_position = list(offsets[:-1])
+            for i in range(len(self._nodes)):
+                for j in self.targets[self.offsets[i]:self.offsets[i + 1]]:
+                    sources[next_position[j]] = i
+                    next_position[j] += 1
+            self._reversed = offsets, sources
+        return self._reversed
+
+    def predecessors(self, node: Node) -> List[Node]:
+        i = self.index.get(node)
+        if i is None:
+            return []
+        offsets, sources = self.reversed_arrays()
+        return [self._nodes[j] for j in sources[offsets[i]:offsets[i + 1]]]
+
+    def _came_from_nodes(self, came_from: List[int]) -> Dict[Node, Optional[Node]]:
+        """Index predecessors to nodes: -1 stands for no predecessor, -2 for not reached"""
+        nodes = self._nodes
+        return {nodes[i]: nodes[j] if j >= 0 else None for i, j in enumerate(came_from) if j != -2}
+
+    def breadth_first_search_indices(self, starts: List[int], is_goal: Callable[[int], bool]):
+        """BFS over node indices from start indices: (came_from list, goal index or None)"""
+        offsets, targets = self.offsets, self.targets
+        came_from = [-2] * len(self._nodes)
+        for start in starts:
+            came_from[start] = -1
+            if is_goal(start):
+                return came_from, start
+        frontier = list(starts)
+        for current in frontier:  # the list grows while iterating, it's the queue
+            for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                if came_from[neighbor] == -2:
+                    came_from[neighbor] = current
+                    if is_goal(neighbor):
+                        return came_from, neighbor
+                    frontier.append(neighbor)
+        return came_from, None
+
+    def index_goal_predicate(self, goal: Union[Node | Callable]) -> Callable[[int], bool]:
+        nodes = self._nodes
+        if callable(goal):
+            def is_goal(i):
+                return goal(nodes[i])
+        else:
+            goal_index = self.index.get(goal, -1)
+
+            def is_goal(i):
+                return i == goal_index
+        return is_goal
+
+    def start_indices(self, start: Union[Node, Iterable[Node]]) -> List[int]:
+        return [self.index[node] for node in self.start_nodes(start)]
+
+    def breadth_first_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable] = None):
+        came_from, result = self.breadth_first_search_indices(self.start_indices(start),
+                                                              self.index_goal_predicate(goal))
+        return self._came_from_nodes(came_from), self._nodes[result] if result is not None else None
+
+
+class CSRWeightedGraph(CSRGraph, WeightedGraph):
+    """CSRGraph with edge weights in a weights array aligned with targets, of ints when all weights are"""
+    def __init__(self, nodes: List[Node], offsets: array, targets: array, weights: array):
+        super().__init__(nodes, offsets, targets)
+        self.weights = weights
+        self._distance_matrix = None
+
+    def distance_matrix(self) -> 'DistanceMatrix':
+        """All pairs distances, computed once as the graph is frozen"""
+        if self._distance_matrix is None:
+            self._distance_matrix = self.all_pairs_shortest_paths()
+        return self._distance_matrix
+
+    @classmethod
+    def from_graph(cls, graph: WeightedGraph):
+        nodes, offsets, targets, edges = cls._index_graph(graph)
+        weights = [graph.cost(a, b) for a, b in edges]
+        return cls(nodes, offsets, targets, array('q' if all(isinstance(w, int) for w in weights) else 'd', weights))
+
+    def cost(self, from_node: Node, to_node: Node) -> float:
+        i, j = self.index[from_node], self.index[to_node]
+        for e in range(self.offsets[i], self.offsets[i + 1]):
+            if self.targets[e] == j:
+                return self.weights[e]
+        raise KeyError((from_node, to_node))
+
+    def dijkstra_search_indices(self, starts: List[int], is_goal: Callable[[int], bool] = None,
+                                heuristic: Callable[[int], float] = None):
+        """Dijkstra, or A* with a heuristic, over node indices: (came_from, cost_so_far, goal or None)"""
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        size = len(self._nodes)
+        came_from = [-2] * size
+        cost_so_far = [float('inf')] * size
+        for start in starts:
+            came_from[start] = -1
+            cost_so_far[start] = 0
+        pqueue = [(0, 0, start) for start in starts]  # (priority, cost when queued, node)
+        heapq.heapify(pqueue)
+        while pqueue:
+            _, current_cost, current = heapq.heappop(pqueue)
+            if current_cost > cost_so_far[current]:
+                continue  # outdated entry, current was queued again with a lower cost
+            if is_goal is not None and is_goal(current):
+                return came_from, cost_so_far, current
+            for e in range(offsets[current], offsets[current + 1]):
+                next_node = targets[e]
+                new_cost = current_cost + weights[e]
+                if new_cost < cost_so_far[next_node]:
+                    cost_so_far[next_node] = new_cost
+                    came_from[next_node] = current
+                    heapq.heappush(pqueue, (new_cost + heuristic(next_node) if heuristic else new_cost,
+                                            new_cost, next_node))
+        return came_from, cost_so_far, None
+
+    def _search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable], heuristic=None):
+        nodes = self._nodes
+        came_from, cost_so_far, result = self.dijkstra_search_indices(self.start_indices(start),
+                                                                      self.index_goal_predicate(goal), heuristic)
+        return (self._came_from_nodes(came_from),
+                {nodes[i]: cost for i, cost in enumerate(cost_so_far) if came_from[i] != -2},
+                nodes[result] if result is not None else None)
+
+    # Without an explicit queue, searches run over node indices with heapq
+    def dijkstra_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable] = None, queue=None):
+        if queue is not None:
+            return super().dijkstra_search(start, goal, queue)
+        return self._search(start, goal)
+
+    def a_star_search(self, start: Union[Node, Iterable[Node]], goal: Union[Node | Callable], heuristic=None,
+                      queue=None):
+        if queue is not None:
+            return super().a_star_search(start, goal, heuristic, queue)
+        nodes = self._nodes
+        return self._search(start, goal, (lambda i: heuristic(nodes[i], goal)) if heuristic else None)
+
+    def weighted_edges(self) -> Tuple[List[Node], List[Tuple[int, int, float]]]:
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        return self._nodes, [(i, targets[e], weights[e])
+                             for i in range(len(self._nodes)) for e in range(offsets[i], offsets[i + 1])]
+
+    def floyd_warshall_indices(self):
+        """Floyd-Warshall over node indices: (distances, predecessors) matrices as lists of rows"""
+        size = len(self._nodes)
+        inf = float('inf')
+        distances = [[inf] * size for _ in range(size)]
+        predecessors = [[None] * size for _ in range(size)]
+        for i in range(size):
+            distances[i][i] = 0
+            for e in range(self.offsets[i], self.offsets[i + 1]):
+                j = self.targets[e]
+                distances[i][j] = self.weights[e]
+                predecessors[i][j] = i
+
+        for k in range(size):
+            row_k = distances[k]
+            predecessors_k = predecessors[k]
+            for i in range(size):
+                row_i = distances[i]
+                distance_ik = row_i[k]
+                if distance_ik == inf:
+                    continue
+                predecessors_i = predecessors[i]
+                for j in range(size):
+                    potential_new_distance = distance_ik + row_k[j]
+                    if potential_new_distance < row_i[j]:
+                        row_i[j] = potential_new_distance
+                        predecessors_i[j] = predecessors_k[j]
+        return distances, predecessors
+
+    def floyd_warshall(self):
+        nodes = self._nodes
+        _distances, _predecessors = self.floyd_warshall_indices()
+        distances = {from_node: dict(zip(nodes, row)) for from_node, row in zip(nodes, _distances)}
+        predecessors = {from_node: {to_node: nodes[k] if k is not None else None for to_node, k in zip(nodes, row)}
+                        for from_node, row in zip(nodes, _predecessors)}
+        return distances, predecessors
+
+
+def contract(graph: WeightedGraph, keep: Callable[[Node], bool]) -> CSRWeightedGraph:
+    """Graph over the nodes passing keep, weighted by the lengths of shortest paths between them in graph"""
+    nodes, edges = graph.weighted_edges()
+    adjacency = [[] for _ in nodes]
+    for i, j, weight in edges:
+        adjacency[i].append((j, weight))
+    kept = [i for i, node in enumerate(nodes) if keep(node)]
+    rows = [_single_source_dijkstra(i, adjacency)[0] for i in kept]
+    distances = [[row[j] for j in kept] for row in rows]
+
+    inf = float('inf')
+    integral = all(isinstance(weight, int) for _, _, weight in edges)
+    offsets, targets, weights = array('l', [0]), array('l'), []
+    for i, row in enumerate(distances):
+        for j, distance in enumerate(row):
+            if i != j and distance != inf:
+                targets.append(j)
+                weights.append(distance)
+        offsets.append(len(targets))
+    kept_nodes = [nodes[i] for i in kept]
+    contracted = CSRWeightedGraph(kept_nodes, offsets, targets, array('q' if integral else 'd', weights))
+    contracted._distance_matrix = DistanceMatrix(kept_nodes, array('d', chain.from_iterable(distances)),
+                                                 integral=integral)
+    return contracted
+
+
 GridLocation = Tuple[int, int]
 
 
 class SquareGrid(Graph):
+    directed = False
+
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
@@ -269,5 +1129,412 @@ class WeightedSquareGrid(SquareGrid, WeightedGraph):
     def cost(self, from_location: GridLocation, to_location: GridLocation) -> float:
         return self.weights.get(to_location, 1)
 
-    def a_star_search(self, start: GridLocation, goal: GridLocation, heuristic=distance_heuristic):
-        return super().a_star_search(start, goal, heuristic)
+    def a_star_search(self, start: GridLocation, goal: GridLocation, heuristic=distance_heuristic, queue='indexed',
+                      jump_points=False):
+        """See WeightedGraph.a_star_search, with jump_points runs jump_point_search instead"""
+        if jump_points:
+            return self.jump_point_search(start, goal)
+        return super().a_star_search(start, goal, heuristic, queue)
+
+    def jump_point_search(self, start: GridLocation, goal: GridLocation):
+        """A* over the cells where shortest paths may turn, on this grid with unit costs"""
+        if any(weight != 1 for weight in self.weights.values()):
+            raise ValueError('Jump point search needs uniform costs of 1')
+        if callable(goal) or self.several_starts(start):
+            raise ValueError('Jump point search needs a single start and a goal location')
+        walls = set(self.walls)
+        open_cells = {(x, y) for y in range(self.height) for x in range(self.width) if (x, y) not in walls}
+        horizontal_jumps = {}  # all cells of a run jump to the same point, vertical runs scan rows repeatedly
+
+        def jump_horizontally(x, y, dx):
+            key = x, y, dx
+            if key in horizontal_jumps:
+                return horizontal_jumps[key]
+            run = [key]
+            jump_point = None
+            while True:
+                x += dx
+                key = x, y, dx
+                if key in horizontal_jumps:
+                    jump_point = horizontal_jumps[key]
+                    break
+                if (x, y) not in open_cells:
+                    break
+                if (x, y) == goal or ((x, y - 1) in open_cells and (x - dx, y - 1) not in open_cells) \
+                        or ((x, y + 1) in open_cells and (x - dx, y + 1) not in open_cells):
+                    jump_point = x, y
+                    break
+                run.append(key)
+            for key in run:
+                horizontal_jumps[key] = jump_point
+            return jump_point
+
+        def jump_vertically(x, y, dy):
+            while True:
+                y += dy
+                if (x, y) not in open_cells:
+                    return None
+                if (x, y) == goal or jump_horizontally(x, y, 1) or jump_horizontally(x, y, -1):
+                    return x, y
+
+        pqueue = IndexedPriorityQueue()
+        pqueue.put(start, 0)
+        came_from: Dict[GridLocation, Optional[GridLocation]] = {start: None}
+        cost_so_far: Dict[GridLocation, float] = {start: 0}
+        reached = None
+        while pqueue:
+            current = pqueue.get()
+            if current == goal:
+                reached = current
+                break
+            x, y = current
+            previous = came_from[current]
+            backward = None
+            if previous is not None:  # no need to jump back where we come from
+                backward = ((previous[0] > x) - (previous[0] < x), (previous[1] > y) - (previous[1] < y))
+            for dx, dy in ((1, 0), (-1, 0), (0, -1), (0, 1)):
+                if (dx, dy) == backward:
+                    continue
+                jump_point = jump_horizontally(x, y, dx) if dx else jump_vertically(x, y, dy)
+                if jump_point is None:
+                    continue
+                new_cost = cost_so_far[current] + distance_heuristic(current, jump_point)
+                if jump_point not in cost_so_far or new_cost < cost_so_far[jump_point]:
+                    cost_so_far[jump_point] = new_cost
+                    came_from[jump_point] = current
+                    pqueue.put(jump_point, new_cost + distance_heuristic(jump_point, goal))
+
+        if reached is not None:  # fill the straight runs between jump points of the path
+            current = goal
+            while came_from[current] is not None:
+                previous = came_from[current]
+                dx, dy = (previous[0] > current[0]) - (previous[0] < current[0]), \
+                    (previous[1] > current[1]) - (previous[1] < current[1])
+                cell = current
+                while cell != previous:
+                    next_cell = cell[0] + dx, cell[1] + dy
+                    came_from[cell] = next_cell
+                    cost_so_far[next_cell] = cost_so_far[cell] - 1
+                    cell = next_cell
+                current = previous
+        return came_from, cost_so_far, reached
+
+    def bidirectional_a_star_search(self, start: GridLocation, goal: GridLocation, heuristic=distance_heuristic):
+        return super().bidirectional_a_star_search(start, goal, heuristic)
+
+
+class ArraySquareGrid(WeightedGraph):
+    """Square grid in flat buffers indexed by cell id = (y + 1) * (width + 1) + x, walled all around"""
+    directed = False
+
+    def __init__(self, width: int, height: int, walls=(), weights: Dict[GridLocation, float] = None):
+        self.width = width
+        self.height = height
+        self.stride = stride = width + 1
+        self.open = bytearray(stride * (height + 2))
+        for y in range(height):
+            self.open[(y + 1) * stride:(y + 1) * stride + width] = b'\x01' * width
+        for location in walls:
+            self.open[self.cell_id(location)] = 0
+        self.weights = None
+        if weights:
+            typecode = 'q' if all(isinstance(weight, int) for weight in weights.values()) else 'd'
+            self.weights = array(typecode, [1]) * len(self.open)
+            for location, weight in weights.items():
+                self.weights[self.cell_id(location)] = weight
+        self.offsets = (1, -1, -stride, stride)  # E W N S, no bound checks needed within the walls
+
+    def cell_id(self, location: GridLocation) -> int:
+        x, y = location
+        return (y + 1) * self.stride + x
+
+    def location(self, cell_id: int) -> GridLocation:
+        y, x = divmod(cell_id, self.stride)
+        return x, y - 1
+
+    def in_bounds(self, location: GridLocation) -> bool:
+        (x, y) = location
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def passable(self, location: GridLocation) -> bool:
+        return self.in_bounds(location) and bool(self.open[self.cell_id(location)])
+
+    @property
+    def nodes(self) -> List[GridLocation]:
+        return [self.location(cell) for cell, is_open in enumerate(self.open) if is_open]
+
+    def neighbor_cells(self, cell: int) -> List[int]:
+        is_open = self.open
+        return [cell + offset for offset in self.offsets if is_open[cell + offset]]
+
+    def neighbors(self, location: GridLocation) -> List[GridLocation]:
+        return [self.location(cell) for cell in self.neighbor_cells(self.cell_id(location))]
+
+    def cost(self, from_location: GridLocation, to_location: GridLocation) -> float:
+        return self.weights[self.cell_id(to_location)] if self.weights else 1
+
+    def breadth_first_search_cells(self, starts: List[int], goal: int = -1):
+        """BFS over cell ids: (came_from array, goal cell or None), -1 for starts, -2 for unreached"""
+        is_open, offsets = self.open, self.offsets
+        came_from = array('l', [-2]) * len(is_open)
+        for start in starts:
+            came_from[start] = -1
+            if start == goal:
+                return came_from, start
+        frontier = list(starts)
+        for current in frontier:  # the list grows while iterating, it's the queue
+            for offset in offsets:
+                neighbor = current + offset
+                if is_open[neighbor] and came_from[neighbor] == -2:
+                    came_from[neighbor] = current
+                    if neighbor == goal:
+                        return came_from, neighbor
+                    frontier.append(neighbor)
+        return came_from, None
+
+    def a_star_search_cells(self, start: int, goal: int):
+        """A* over cell ids with the Manhattan distance heuristic: (came_from array, cost_so_far list)"""
+        is_open, offsets, weights, stride = self.open, self.offsets, self.weights, self.stride
+        goal_y, goal_x = divmod(goal, stride)
+        came_from = array('l', [-2]) * len(is_open)
+        cost_so_far = [float('inf')] * len(is_open)
+        came_from[start] = -1
+        cost_so_far[start] = 0
+        pqueue = [(0, 0, start)]  # (priority, cost when queued, cell)
+        while pqueue:
+            _, current_cost, current = heapq.heappop(pqueue)
+            if current_cost > cost_so_far[current]:
+                continue  # outdated entry, current was queued again with a lower cost
+            if current == goal:
+                break
+            for offset in offsets:
+                neighbor = current + offset
+                if is_open[neighbor]:
+                    new_cost = current_cost + (weights[neighbor] if weights else 1)
+                    if new_cost < cost_so_far[neighbor]:
+                        cost_so_far[neighbor] = new_cost
+                        came_from[neighbor] = current
+                        y, x = divmod(neighbor, stride)
+                        heapq.heappush(pqueue, (new_cost + abs(x - goal_x) + abs(y - goal_y), new_cost, neighbor))
+        return came_from, cost_so_far
+
+    def path_cells(self, came_from: array, goal: int) -> Optional[List[int]]:
+        """Cell ids from a start to goal"""
+        if came_from[goal] == -2:
+            return None
+        path = [goal]
+        while came_from[path[-1]] >= 0:
+            path.append(came_from[path[-1]])
+        path.reverse()
+        return path
+
+    def _came_from_locations(self, came_from: array) -> Dict[GridLocation, Optional[GridLocation]]:
+        location = self.location
+        return {location(cell): location(previous) if previous >= 0 else None
+                for cell, previous in enumerate(came_from) if previous != -2}
+
+    # Location searches run over cell ids for location goals, else fall back on generic searches
+
+    def breadth_first_search(self, start: Union[GridLocation, Iterable[GridLocation]],
+                             goal: Union[GridLocation | Callable] = None):
+        if callable(goal):
+            return super().breadth_first_search(start, goal)
+        goal_cell = self.cell_id(goal) if goal is not None and self.passable(goal) else -1
+        came_from, result = self.breadth_first_search_cells([self.cell_id(node) for node in self.start_nodes(start)],
+                                                            goal_cell)
+        return self._came_from_locations(came_from), self.location(result) if result is not None else None
+
+    def a_star_search(self, start: Union[GridLocation, Iterable[GridLocation]], goal: Union[GridLocation | Callable],
+                      heuristic=distance_heuristic, queue=None):
+        starts = self.start_nodes(start)
+        if (callable(goal) or heuristic is not distance_heuristic or queue is not None or len(starts) != 1
+                or not self.passable(goal)):
+            return super().a_star_search(starts, goal, heuristic, queue or 'indexed')
+        came_from, cost_so_far = self.a_star_search_cells(self.cell_id(starts[0]), self.cell_id(goal))
+        location = self.location
+        return (self._came_from_locations(came_from),
+                {location(cell): cost for cell, cost in enumerate(cost_so_far) if came_from[cell] != -2},
+                goal if came_from[self.cell_id(goal)] != -2 else None)
+
+
+def _identity(state):
+    return state
+
+
+def _no_key(state):
+    return None
+
+
+_shared_incumbent = None
+
+
+def _share_incumbent(incumbent):
+    global _shared_incumbent
+    _shared_incumbent = incumbent
+
+
+def _branch_and_bound_task(search: 'BranchAndBound', states):
+    """(value, best state or None, counters) of a search from states in a worker process"""
+    search.shared = _shared_incumbent
+    value, best_state = search._search(states, search.sign * _shared_incumbent.value)
+    if best_state is not None:
+        value = search.value(best_state)  # the incumbent may come from another worker meanwhile
+    return value, best_state, search.counters()
+
+
+class BranchAndBoundPool:
+    """Worker processes for BranchAndBound.parallel_search, sharing the signed incumbent of a search"""
+    def __init__(self, processes: int = None):
+        self.processes = processes or os.cpu_count() or 1
+        self.incumbent = multiprocessing.Value('d', -float('inf'))
+        self.executor = ProcessPoolExecutor(self.processes, initializer=_share_incumbent, initargs=(self.incumbent,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class BranchAndBound:
+    """Best state reachable from initial through successors(state), pruning states when queued and again when
+    expanded if their upper_bound (a lower bound with maximize=False) can't beat the incumbent"""
+    def __init__(self, successors: Callable, value: Callable, upper_bound: Callable, key: Optional[Callable] = None,
+                 dominates: Optional[Callable] = None, dominance_key: Optional[Callable] = None, maximize=True,
+                 best_first=False):
+        self.successors = successors
+        self.value = value
+        self.upper_bound = upper_bound
+        self.key = key if key is not None else _identity
+        self.dominates = dominates
+        self.dominance_key = dominance_key if dominance_key is not None else _no_key
+        self.sign = 1 if maximize else -1  # values, bounds and incumbents are compared signed, the larger the better
+        self.best_first = best_first
+        self.expanded = self.pruned = self.dominated = self.duplicates = 0
+        self._seen = set()
+        self._kept = {}  # dominance key: states not dominated so far, dominates(a, b) compares states of a key
+        self.shared = None  # multiprocessing.Value of the signed incumbent, shared by parallel searches
+        self.sync_interval = 256  # expansions between reads of the shared incumbent
+
+    def counters(self) -> Dict[str, int]:
+        return {'expanded': self.expanded, 'pruned': self.pruned, 'dominated': self.dominated,
+                'duplicates': self.duplicates}
+
+    def search(self, initial, incumbent=None) -> Tuple[float, object]:
+        """(best value, best state) from initial, best state being None if none beats incumbent"""
+        return self._search([initial], incumbent)
+
+    def _search(self, initials, incumbent=None) -> Tuple[float, object]:
+        self.expanded = self.pruned = self.dominated = self.duplicates = 0
+        self._seen.clear()
+        self._kept.clear()
+        sign = self.sign
+        best = -float('inf') if incumbent is None else sign * incumbent  # signed, the larger the better
+        best_state = None
+        frontier = []
+        counter = count()
+
+        def push(state):
+            bound = sign * self.upper_bound(state)
+            if bound <= best:
+                self.pruned += 1
+            elif self._is_new(state):
+                if self.best_first:
+                    heapq.heappush(frontier, (-bound, next(counter), state))
+                else:
+                    frontier.append((-bound, 0, state))
+
+        for initial in initials:
+            push(initial)
+        while frontier:
+            bound, _, state = heapq.heappop(frontier) if self.best_first else frontier.pop()
+            if -bound <= best:  # incumbent improved since state was queued
+                self.pruned += 1
+                continue
+            value = sign * self.value(state)
+            if value > best:
+                best, best_state = value, state
+                if self.shared is not None:
+                    with self.shared.get_lock():
+                        self.shared.value = max(self.shared.value, best)
+            self.expanded += 1
+            if self.shared is not None and not self.expanded % self.sync_interval:
+                best = max(best, self.shared.value)
+            for next_state in self.successors(state):
+                push(next_state)
+        self._seen.clear()
+        self._kept.clear()
+        return sign * best, best_state
+
+    def parallel_search(self, initial, pool: 'BranchAndBoundPool', incumbent=None,
+                        tasks_per_process=1) -> Tuple[float, object]:
+        """Like search, subtrees below initial being searched by the workers of pool: callbacks must be picklable"""
+        sign = self.sign
+        best = -float('inf') if incumbent is None else sign * incumbent
+        best_state = None
+        self.expanded = self.pruned = self.dominated = self.duplicates = 0
+        self._seen.clear()
+        self._kept.clear()
+        state = initial  # a dive along best bounds, for an incumbent pruning the tasks from the start
+        while state is not None:
+            value = sign * self.value(state)
+            if value > best:
+                best, best_state = value, state
+            state = max(self.successors(state), key=lambda next_state: sign * self.upper_bound(next_state),
+                        default=None)
+        level = [initial]
+        # states of a dominance key make one task, workers only check dominance within their task
+        while 0 < len(tasks := self._tasks(level)) < tasks_per_process * pool.processes:
+            next_level = []
+            for state in level:
+                value = sign * self.value(state)
+                if value > best:
+                    best, best_state = value, state
+                self.expanded += 1
+                for next_state in self.successors(state):
+                    if sign * self.upper_bound(next_state) <= best:
+                        self.pruned += 1
+                    elif self._is_new(next_state):
+                        next_level.append(next_state)
+            level = next_level
+        self._seen.clear()  # not to be sent with each task
+        self._kept.clear()
+        for task in tasks:  # the best bound of a task last, popped first by depth first searches
+            task.sort(key=lambda state: sign * self.upper_bound(state))
+        tasks.sort(key=lambda task: sign * self.upper_bound(task[-1]), reverse=True)
+
+        pool.incumbent.value = best
+        for value, state, counters in pool.executor.map(_branch_and_bound_task, repeat(self), tasks):
+            if state is not None and sign * value > best:
+                best, best_state = sign * value, state
+            for name, counter in counters.items():
+                setattr(self, name, getattr(self, name) + counter)
+        return sign * best, best_state
+
+    def _tasks(self, states) -> List[list]:
+        """states grouped by dominance key, as dominance is only checked within the search of a task"""
+        if self.dominates is None:
+            return [[state] for state in states]
+        groups = {}
+        for state in states:
+            groups.setdefault(self.dominance_key(state), []).append(state)
+        return list(groups.values())
+
+    def _is_new(self, state) -> bool:
+        """Whether state was neither seen nor dominated yet, recording it"""
+        state_key = self.key(state)
+        if state_key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(state_key)
+        if self.dominates is not None:
+            kept = self._kept.setdefault(self.dominance_key(state), [])
+            if any(self.dominates(other, state) for other in kept):
+                self.dominated += 1
+                return False
+            kept[:] = [other for other in kept if not self.dominates(state, other)]
+            kept.append(state)
+        return True
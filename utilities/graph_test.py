@@ -1,4 +1,9 @@
-from utilities.graph import SimpleWeightedGraph, SimpleGraph, print_visitor
+import random
+from array import array
+
+from utilities.graph import (SimpleWeightedGraph, SimpleGraph, CSRWeightedGraph, DynamicShortestPaths,
+                             WeightedSquareGrid, ArraySquareGrid, distance_heuristic, print_visitor)
+from utilities.collections2 import TranspositionTable
 
 graph = SimpleWeightedGraph()
 data = [[(1, 1), (2, 7), (5, 3)], [(0, 1), (2, 1), (5, 1)], [(0, 7), (1, 1)], [(4, 2), (5, 2)], [(3, 2), (5, 5)], [(0, 3), (1, 1), (3, 2), (4, 5)]]
@@ -28,7 +33,84 @@ graph2.depth_first_traversal('A', print_visitor)
 print('BFT')
 graph2.breadth_first_traversal('A', print_visitor)
 
-came_from = graph2.breadth_first_search('A', 'F')
+came_from, _ = graph2.breadth_first_search('A', 'F')
 path24 = graph2.reconstruct_path(came_from, 'A', 'F')
 print(path24)
 
+
+print('CSR')
+csr_graph = CSRWeightedGraph.from_graph(graph)
+csr_result, csr_routes = csr_graph.floyd_warshall()
+print(csr_result[2][4], csr_graph.reconstruct_path(csr_routes[2], 2, 4))
+print(csr_graph.dijkstra_search(2, 4))
+
+matrix = graph.floyd_warshall_matrix(predecessors=True)
+print(matrix[2][4], matrix.path(2, 4))
+print(graph.all_pairs_shortest_paths()[2][4])
+
+print('IDDFS', graph2.iterative_deepening_search('A', 'H', table=TranspositionTable(100)))
+print('IDA*', graph.ida_star_search(2, 4))
+
+print('Dynamic shortest paths')
+rng = random.Random(0)
+dynamic_graph = SimpleWeightedGraph()
+for i, neighbors in enumerate(data):
+    for neighbor, weight in neighbors:
+        dynamic_graph.add_edge(i, neighbor, weight)
+dynamic = DynamicShortestPaths(dynamic_graph)
+for step in range(200):
+    node1, node2 = rng.randrange(8), rng.randrange(8)
+    if step == 100:
+        dynamic_graph.neighbors('unknown')  # reading edges of an unknown node adds it
+    elif node2 in dynamic_graph.edges[node1] and rng.random() < 0.5:
+        if rng.random() < 0.5:
+            dynamic_graph.remove_edge(node1, node2)
+        else:
+            dynamic_graph.add_edge(node1, node2, dynamic_graph.edges[node1][node2] + rng.randint(1, 5))
+    elif node1 != node2:
+        dynamic_graph.add_edge(node1, node2, rng.randint(1, 9))
+    expected = dynamic_graph.floyd_warshall_matrix()
+    for node1 in dynamic.nodes:
+        for node2 in dynamic.nodes:
+            assert dynamic.distance(node1, node2) == expected[node1][node2], (step, node1, node2)
+print(len(dynamic.nodes), 'nodes', dynamic[2])
+
+print('CSR Dijkstra')
+random_graph = SimpleWeightedGraph()
+for _ in range(150):
+    random_graph.add_edge(rng.randrange(40), rng.randrange(40), rng.randint(1, 20))
+csr_random_graph = CSRWeightedGraph.from_graph(random_graph)
+for start in range(0, 40, 7):
+    popped = []  # a goal predicate never met sees each expanded node
+    _, csr_costs, _ = csr_random_graph.dijkstra_search(start, lambda node: popped.append(node))
+    _, costs, _ = random_graph.dijkstra_search(start)
+    assert csr_costs == costs, start
+    assert len(popped) == len(set(popped)) == len(costs), start
+print(len(costs), 'nodes reached from', start)
+
+print('Array grid A*')
+
+
+class ReadCountingArray(array):
+    reads = 0
+
+    def __getitem__(self, index):
+        ReadCountingArray.reads += 1
+        return super().__getitem__(index)
+
+
+walls = {(rng.randrange(30), rng.randrange(30)) for _ in range(200)} - {(0, 0), (29, 29)}
+weights = {(x, y): rng.randint(1, 9) for x in range(30) for y in range(30)}
+weighted_grid = WeightedSquareGrid(30, 30)
+weighted_grid.walls, weighted_grid.weights = walls, weights
+array_grid = ArraySquareGrid(30, 30, walls, weights)
+array_grid.weights = ReadCountingArray(array_grid.weights.typecode, array_grid.weights)  # read once per move
+_, array_costs, _ = array_grid.a_star_search((0, 0), (29, 29))
+_, costs, _ = weighted_grid.dijkstra_search((0, 0), (29, 29))
+assert array_costs[(29, 29)] == costs[(29, 29)]
+goal_cost = costs[(29, 29)]
+# A* only expands cells within the goal cost, once each
+moves = sum(len(array_grid.neighbors(cell)) for cell, cost in array_costs.items()
+            if cost + distance_heuristic(cell, (29, 29)) <= goal_cost)
+assert ReadCountingArray.reads <= moves, (ReadCountingArray.reads, moves)
+print(goal_cost, ReadCountingArray.reads, 'moves tried')
@@ -0,0 +1,247 @@
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+from time import perf_counter
+
+
+def function_label(filename, name):
+    return f'{os.path.basename(filename)}:{name}' if filename != '~' else name
+
+
+class SamplingProfiler:
+    """Lightweight profiler sampling the call stack of a thread from a background thread.
+    Much less overhead than cProfile on call intensive code, at the cost of statistical results."""
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._switch_interval = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))  # let the sampler get the GIL in time
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)  # noqa
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(function_label(code.co_filename, getattr(code, 'co_qualname', code.co_name)))
+                frame = frame.f_back
+            if stack and not self._stop.is_set():  # else the sampled thread is waiting for the sampler
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed format of flamegraph.pl / speedscope"""
+        return [f"{';'.join(stack)} {count}" for stack, count in self.stacks.items()]
+
+    def top(self, n):
+        """n functions with most samples on top of the stack: (label, self samples, total samples)"""
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self.stacks.items():
+            self_samples[stack[-1]] += count
+            for label in set(stack):
+                total_samples[label] += count
+        return [(label, count, total_samples[label]) for label, count in self_samples.most_common(n)]
+
+
+def collapsed_from_stats(stats: pstats.Stats, max_depth=64):
+    """Approximate collapsed stacks from cProfile caller/callee edges, in microseconds.
+    Time of a function called from several places is split in proportion to each caller edge."""
+    callees = defaultdict(list)
+    roots = []
+    for function, (_, _, _, _, callers) in stats.stats.items():  # noqa
+        if not callers:
+            roots.append(function)
+        for caller, (_, _, _, cumulative_time) in callers.items():
+            callees[caller].append((function, cumulative_time))
+
+    lines = Counter()
+
+    def walk(function, stack, time):
+        _, _, self_time, cumulative_time, _ = stats.stats[function]  # noqa
+        stack = stack + [function_label(function[0], function[2])]
+        scale = time / cumulative_time if cumulative_time else 0
+        lines[';'.join(stack)] += self_time * scale
+        if len(stack) < max_depth:
+            for callee, edge_time in callees[function]:
+                if callee != function and function_label(callee[0], callee[2]) not in stack:  # cut recursions
+                    walk(callee, stack, edge_time * scale)
+
+    for root in roots:
+        walk(root, [], stats.stats[root][3])  # noqa
+    return [f'{stack} {round(time * 1e6)}' for stack, time in lines.items() if round(time * 1e6) > 0]
+
+
+class Profile:
+    """Context manager profiling its body with cProfile ('cprofile' mode) or with the sampling profiler
+    ('sampling' mode). On exit, name.pstats (cprofile only) and name.collapsed files are written
+    into output_dir, and the top hot functions by self time are printed."""
+    modes = ('cprofile', 'sampling')
+
+    def __init__(self, name, mode='cprofile', output_dir='profiles', top=10, interval=0.001):
+        if mode not in self.modes:
+            raise ValueError(f'Unknown profile mode {mode}, expecting one of {self.modes}')
+        self.name = re.sub(r'[^\w.-]+', '_', name)
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.interval = interval
+        self._profiler = None
+        self._start = None
+        self._elapsed = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._profiler = cProfile.Profile() if self.mode == 'cprofile' else SamplingProfiler(self.interval)
+        self._start = perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+
+    def stop(self, report=True):
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self._elapsed = perf_counter() - self._start
+        if report:
+            self.report()
+
+    def report(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.mode == 'cprofile':
+            self._report_cprofile(self._elapsed)
+        else:
+            self._report_sampling(self._elapsed)
+
+    def _write_collapsed(self, lines):
+        with open(self.output_dir / f'{self.name}.collapsed', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _report_cprofile(self, elapsed):
+        stats = pstats.Stats(self._profiler)
+        stats.dump_stats(self.output_dir / f'{self.name}.pstats')
+        self._write_collapsed(collapsed_from_stats(stats))
+        print(f'[profile] {self.name} took {elapsed:.4} s, top {self.top} functions by self time:')
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]  # noqa
+        for (filename, _, name), (_, calls, self_time, cumulative_time, _) in hot:
+            print(f'    {self_time:8.4f} s {self_time / elapsed:6.1%}  cumulated {cumulative_time:8.4f} s  '
+                  f'{calls:9} calls  {function_label(filename, name)}')
+
+    def _report_sampling(self, elapsed):
+        self._write_collapsed(self._profiler.collapsed())
+        samples = sum(self._profiler.stacks.values()) or 1
+        print(f'[profile] {self.name} took {elapsed:.4} s, {samples} samples, top {self.top} functions by self time:')
+        for label, self_samples, total_samples in self._profiler.top(self.top):
+            print(f'    {self_samples / samples:6.1%}  cumulated {total_samples / samples:6.1%}  {label}')
+
+
+def format_size(size):
+    for unit in ['B', 'KiB', 'MiB']:
+        if abs(size) < 1024:
+            return f'{size:.1f} {unit}' if unit != 'B' else f'{size} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
+
+class MemoryTrace:
+    """Context manager measuring with tracemalloc the peak memory allocated by its body (in bytes, above
+    memory in use at start). On exit, the peak and the top allocation sites are printed. As tracemalloc can't
+    tell what was allocated at peak time, sites are those of memory still allocated at exit.
+    Tracing slows Python code down, don't measure time meanwhile. Allocations of profilers are left out, but run them
+    outside of the trace, as those made from C code are ascribed to the profiled lines."""
+    ignored = (tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+               tracemalloc.Filter(False, '<unknown>'),
+               tracemalloc.Filter(False, __file__),  # profilers and their reports
+               tracemalloc.Filter(False, cProfile.__file__),
+               tracemalloc.Filter(False, pstats.__file__))
+
+    def __init__(self, name, top=10, frames=1):
+        self.name = name
+        self.top = top
+        self.frames = frames
+        self.peak = None
+        self._owner = False
+        self._start = None
+        self._snapshots = None  # at start and stop, filtered when reporting, after the trace
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._owner = not tracemalloc.is_tracing()
+        if self._owner:
+            tracemalloc.start(self.frames)
+        self._snapshots = [tracemalloc.take_snapshot()] if self.top else None
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def stop(self, report=True):
+        self.peak = tracemalloc.get_traced_memory()[1] - self._start
+        if self.top:
+            self._snapshots.append(tracemalloc.take_snapshot())
+        if self._owner:
+            tracemalloc.stop()
+        if report:
+            self.report()
+
+    def report(self):
+        print(f'[memory] {self.name} peak {format_size(self.peak)}'
+              f"{f', top {self.top} allocation sites still in use:' if self.top else ''}")
+        if self.top:
+            before, after = (snapshot.filter_traces(self.ignored) for snapshot in self._snapshots)
+            for stat in after.compare_to(before, 'lineno')[:self.top]:
+                if stat.size_diff <= 0:
+                    break
+                frame = stat.traceback[0]
+                print(f'    {format_size(stat.size_diff):>11} {stat.count_diff:+9} blocks  '
+                      f'{os.path.basename(frame.filename)}:{frame.lineno}')
+        self._snapshots = None
+
+
+if __name__ == '__main__':
+
+    def fibonacci(n):
+        return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+    def work():
+        return sum(fibonacci(n) for n in range(20)), sorted(range(1_000_000, 0, -1))
+
+    for profile_mode in Profile.modes:
+        with Profile(f'example_{profile_mode}', profile_mode, output_dir='profiles'):
+            work()
+
+    with MemoryTrace('example', top=3):
+        kept = work()
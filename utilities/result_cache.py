@@ -0,0 +1,92 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def local_dependencies(script: Path, root: Path):
+    """Python files of the repository imported by a script, directly or not:
+    utilities modules, and modules of the script directory (like day06_perf importing day06)"""
+    dependencies = set()
+    to_parse = [script.resolve()]
+    while to_parse:
+        current = to_parse.pop()
+        try:
+            tree = ast.parse(current.read_text(), str(current))
+        except (OSError, SyntaxError):
+            continue
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.append(node.module)
+                names.extend(f'{node.module}.{alias.name}' for alias in node.names)  # from package import module
+        for name in names:
+            relative = Path(*name.split('.')).with_suffix('.py')
+            for candidate in (root / relative, script.parent / relative):
+                candidate = candidate.resolve()
+                if candidate.is_file() and candidate not in dependencies:
+                    dependencies.add(candidate)
+                    to_parse.append(candidate)
+    dependencies.discard(script.resolve())
+    return sorted(dependencies)
+
+
+def hash_files(files):
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(file.name.encode())
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On disk cache of successful day script runs (output and elapsed time).
+    Entries are keyed by hashes of the script source, of the repository modules it imports and of the
+    text files of its directory (inputs), and the least recently used ones are dropped beyond max_entries.
+    With force, lookups always miss but results are still stored."""
+    def __init__(self, directory: Path, root: Path, max_entries=256, force=False):
+        self.directory = Path(directory)
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.force = force
+
+    def key(self, script: Path):
+        parts = [
+            sys.version,
+            hash_files([script]),
+            hash_files(local_dependencies(script, self.root)),
+            hash_files(sorted(script.parent.glob('*.txt'))),
+        ]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f'{key}.json'
+
+    def get(self, key):
+        """(elapsed, output) of a cached run, or None"""
+        path = self._path(key)
+        if self.force or not path.is_file():
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # most recently used
+        return entry['elapsed'], entry['output']
+
+    def put(self, key, elapsed, output):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self._path(key), 'w') as f:
+            json.dump({'elapsed': elapsed, 'output': output}, f)
+        self.prune()
+
+    def prune(self):
+        """Drop least recently used entries beyond max_entries"""
+        entries = sorted(self.directory.glob('*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,173 @@
+import importlib.util
+import io
+import os
+import re
+import sys
+import traceback
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from pathlib import Path
+from time import perf_counter
+
+
+class PartMarkers(io.TextIOBase):
+    """Output sink spotting the '--------- filename' and 'Part N: ...' lines printed by solve_problem,
+    to split measurements by input file and part"""
+    file_header = re.compile(r'-{9} (.*)')
+    part_result = re.compile(r'Part (\d+)\b')
+
+    def __init__(self, on_file=None, on_part=None, echo=None):
+        self.on_file = on_file
+        self.on_part = on_part
+        self.echo = echo
+        self._line = ''
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if self.echo is not None:
+            self.echo.write(text)
+        lines = (self._line + text).split('\n')
+        self._line = lines.pop()  # incomplete line, wait for its end
+        for line in lines:
+            if (match := self.file_header.match(line)) and self.on_file:
+                self.on_file(match[1])
+            elif (match := self.part_result.match(line)) and self.on_part:
+                self.on_part(int(match[1]))
+        return len(text)
+
+
+class Tee(io.TextIOBase):
+    """Output sink writing to several streams, e.g. capturing an output while still showing it"""
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+class PartInstrumentation:
+    """PartMarkers callbacks running instruments separately on each part of each solve_problem call.
+    Instrument factories are called with a name made of the script, the input file and the part, and return
+    objects with start(), stop(report=True) and report() methods, like utilities.profiling Profile and MemoryTrace.
+    All instruments are stopped before any report, not to measure the reports of each other."""
+    def __init__(self, script: Path, factories):
+        self.script = script
+        self.factories = list(factories)
+        self._filename = None
+        self._instruments = []
+
+    def _name(self, part):
+        return f'{self.script.stem}_{self._filename}_part{part}'
+
+    def _start(self, part):
+        self._instruments = [factory(self._name(part)) for factory in self.factories]
+        for instrument in self._instruments:
+            instrument.start()
+
+    def on_file(self, filename):
+        self.discard()
+        self._filename = filename
+        self._start(1)
+
+    def on_part(self, part):
+        for instrument in reversed(self._instruments):
+            instrument.stop(report=False)
+        for instrument in reversed(self._instruments):
+            instrument.name = self._name(part)
+            instrument.report()
+        self._start(part + 1)
+
+    def discard(self):
+        """Stop running instruments without report, e.g. after the last part"""
+        for instrument in reversed(self._instruments):
+            instrument.stop(report=False)
+        self._instruments = []
+
+
+@contextmanager
+def day_context(day_directory: Path):
+    """Make a day directory current and importable, like when running its scripts from there"""
+    previous_directory = os.getcwd()
+    path_entry = str(day_directory)
+    os.chdir(day_directory)
+    sys.path.insert(0, path_entry)
+    try:
+        yield
+    finally:
+        sys.path.remove(path_entry)
+        os.chdir(previous_directory)
+
+
+def import_day_module(script: Path):
+    """Import a day script as a module, once per process.
+    It is registered under its own name, so that sibling imports (from day06 import ...) reuse it"""
+    name = script.stem
+    module = sys.modules.get(name)
+    if module is not None and Path(module.__file__).resolve() == script.resolve():
+        return module
+    spec = importlib.util.spec_from_file_location(name, script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        with day_context(script.parent):
+            spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def run_day_module(script: Path):
+    """Import a day script and run its main(), which calls solve_problem(filename, expected1, expected2)
+    for each input file"""
+    module = import_day_module(script)
+    with day_context(script.parent):
+        module.main()
+
+
+def run_in_process(script: Path, capture=True, echo=False, instruments=()):
+    """In-process counterpart of a script run, returns (returncode, elapsed, output)
+    output is None when not captured, with echo it is also written to stdout as it comes.
+    instruments are factories of profilers or memory tracers run on each part, see PartInstrumentation"""
+    output = io.StringIO() if capture else None
+    if capture and echo:
+        output = Tee(output, sys.stdout)
+    stdout = output or sys.stdout
+    part_instrumentation = None
+    if instruments:
+        part_instrumentation = PartInstrumentation(script, instruments)
+        stdout = PartMarkers(part_instrumentation.on_file, part_instrumentation.on_part, echo=stdout)
+    start = perf_counter()
+    returncode = 0
+    with redirect_stdout(stdout), redirect_stderr(output or sys.stderr):
+        try:
+            run_day_module(script)
+        except SystemExit as e:
+            # like an interpreter exit: None is a success, other objects are printed and fail
+            if e.code is None:
+                returncode = 0
+            elif isinstance(e.code, int):
+                returncode = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except Exception:  # noqa, a failing day shall not stop the others
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            if part_instrumentation is not None:
+                part_instrumentation.discard()
+    elapsed = perf_counter() - start
+    if isinstance(output, Tee):
+        output = output.streams[0]
+    return returncode, elapsed, output.getvalue() if capture else None
@@ -1,34 +1,200 @@
+import atexit
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import statistics
 from functools import wraps
 from time import perf_counter
 
+from utilities.profiling import Profile, MemoryTrace
+
+
+def percentile(samples, p):
+    """Nearest rank percentile"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def timing_statistics(samples, z=1.96):
+    """Statistics of per round durations. Outliers beyond Tukey's fences (1.5 IQR away from quartiles)
+    are left out of mean, stdev and confidence interval, ci is the relative half-width of the latter
+    (95% by default)"""
+    ordered = sorted(samples)
+    if len(ordered) > 1:
+        q1, _, q3 = statistics.quantiles(ordered, n=4)
+    else:
+        q1 = q3 = ordered[0]
+    iqr = q3 - q1
+    kept = [sample for sample in ordered if q1 - 1.5 * iqr <= sample <= q3 + 1.5 * iqr]
+    mean = statistics.fmean(kept)
+    stdev = statistics.stdev(kept) if len(kept) > 1 else 0.0
+    return {
+        'rounds': len(ordered),
+        'total': sum(ordered),
+        'min': ordered[0],
+        'mean': mean,
+        'median': statistics.median(ordered),
+        'stdev': stdev,
+        'iqr': iqr,
+        'outliers': len(ordered) - len(kept),
+        'ci': z * stdev / math.sqrt(len(kept)) / mean if mean and len(kept) > 1 else math.inf,
+    }
+
+
+def format_duration(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('µs', 1e-6)]:
+        if seconds >= scale:
+            return f'{seconds / scale:.4} {unit}'
+    return f'{seconds / 1e-9:.4} ns'
+
+
+class TimingRegistry:
+    """Process-wide store of @timeit measurements, only fed when enabled"""
+    fields = ['function', 'args_digest', 'rounds', 'total', 'min', 'mean', 'median', 'stdev', 'iqr', 'outliers', 'ci',
+              'peak_memory']
+
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self._reports = []
+
+    def enable(self, report=None):
+        """Start recording, report is an optional .csv or .json file written at exit"""
+        self.enabled = True
+        if report is not None:
+            if not self._reports:
+                atexit.register(self._save_reports)
+            self._reports.append(report)
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.records.clear()
+
+    @staticmethod
+    def digest(args, kwargs):
+        text = repr(args) + repr(sorted(kwargs.items()))
+        text = re.sub(r' at 0x[0-9a-fA-F]+', '', text)  # default object representations change at each run
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+    def record(self, function, args, kwargs, stats):
+        self.records.append({
+            'function': f'{function.__module__}.{function.__qualname__}',
+            'args_digest': self.digest(args, kwargs),
+            **stats,
+        })
+
+    def as_dict(self):
+        """Records grouped by function name"""
+        result = {}
+        for record in self.records:
+            result.setdefault(record['function'], []).append(record)
+        return result
+
+    def to_json(self, file):
+        json.dump(self.as_dict(), file, indent=2)
+
+    def to_csv(self, file):
+        writer = csv.DictWriter(file, fieldnames=self.fields)
+        writer.writeheader()
+        writer.writerows(self.records)
+
+    def save(self, filename):
+        with open(filename, 'w', newline='') as f:
+            if str(filename).endswith('.csv'):
+                self.to_csv(f)
+            else:
+                self.to_json(f)
+
+    def _save_reports(self):
+        for report in self._reports:
+            self.save(report)
+
+
+registry = TimingRegistry()
+if os.environ.get('TIMEIT_REPORT'):  # e.g. TIMEIT_REPORT=timings.csv python day16.py
+    registry.enable(os.environ['TIMEIT_REPORT'])
+
 
 class timeit: # noqa
-    def __init__(self, verbose=False, rounds=1):
+    """Decorator timing each call of a function.
+    warmup calls are run first and not measured. With target_ci, rounds are doubled until the relative
+    half-width of the mean confidence interval gets below it, or max_rounds or max_time is reached.
+    Statistics of the last call are kept in the wrapper statistics attribute.
+    profile can be 'cprofile' or 'sampling' to profile the measured rounds (see utilities.profiling.Profile).
+    memory traces the peak memory of one extra call, kept out of the timed rounds as tracing is slow
+    (see utilities.profiling.MemoryTrace)."""
+    def __init__(self, verbose=False, rounds=1, warmup=0, target_ci=None, max_rounds=10_000, max_time=10.0,
+                 profile=None, profile_dir='profiles', profile_top=10, memory=False, memory_top=0):
         self.verbose = verbose
         self.rounds = max(rounds, 1)
+        self.warmup = warmup
+        self.target_ci = target_ci
+        self.max_rounds = max(max_rounds, self.rounds)
+        self.max_time = max_time
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.profile_top = profile_top
+        self.memory = memory
+        self.memory_top = memory_top
+
+    def measure(self, function, args, kwargs):
+        for _ in range(self.warmup):
+            function(*args, **kwargs)
+        result = None
+        samples = []
+        rounds = self.rounds
+        deadline = perf_counter() + self.max_time
+        while True:
+            for _ in range(rounds):
+                start = perf_counter()
+                result = function(*args, **kwargs)
+                samples.append(perf_counter() - start)
+            stats = timing_statistics(samples)
+            if (self.target_ci is None or stats['ci'] <= self.target_ci
+                    or len(samples) >= self.max_rounds or perf_counter() >= deadline):
+                return result, stats
+            rounds = min(len(samples), self.max_rounds - len(samples))
 
     def __call__(self, function):
         @wraps(function)
         def wrapper_function(*args, **kwargs):
-            start = perf_counter()
-            result = None
-            for _ in range(self.rounds):
-                result = function(*args, **kwargs)
-            elapsed = perf_counter() - start
+            if self.profile:
+                with Profile(function.__qualname__, self.profile, self.profile_dir, self.profile_top):
+                    result, stats = self.measure(function, args, kwargs)
+            else:
+                result, stats = self.measure(function, args, kwargs)
+            if self.memory:
+                with MemoryTrace(function.__qualname__, self.memory_top) as trace:
+                    function(*args, **kwargs)
+                stats['peak_memory'] = trace.peak
+            wrapper_function.statistics = stats
+            if registry.enabled:
+                registry.record(function, args, kwargs, stats)
             calls = ''
-            if self.rounds > 1:
-                calls = f'{self.rounds} calls '
+            details = ''
+            if stats['rounds'] > 1:
+                calls = f"{stats['rounds']} calls "
                 if self.verbose:
                     calls += 'to '
+                details = (f" (median {format_duration(stats['median'])}, stdev {format_duration(stats['stdev'])}, "
+                           f"IQR {format_duration(stats['iqr'])}"
+                           f"{', ' + str(stats['outliers']) + ' outliers' if stats['outliers'] else ''})")
             if self.verbose:
                 print(f"[@timeit] {calls}{function.__name__}("
                       f"{', '.join(str(arg) for arg in args)}"
                       f"{', ' if args and kwargs else ''}"
                       f"{', '.join(str(k) + '=' + str(v) for k, v in kwargs.items())}"
-                      f") took {elapsed:.4} s")
+                      f") took {stats['total']:.4} s{details}")
             else:
-                print(f"[@timeit] {calls}took {elapsed:.4} s")
+                print(f"[@timeit] {calls}took {stats['total']:.4} s{details}")
             return result
+        wrapper_function.statistics = None
         return wrapper_function
 
 
@@ -43,7 +209,17 @@ if __name__ == '__main__':
     def g(a, b=12):
         return a * b
 
+    @timeit(warmup=3, rounds=10, target_ci=0.01, memory=True)
+    def h(a):
+        return sorted(range(a, 0, -1))
+
     print('Running f')
     f(1_000_000)
     g(1_000, b=14)
+    h(100_000)
+    print(h.statistics)
 
+    registry.enable()
+    f(1_000_000)
+    g(1_000, b=14)
+    print(json.dumps(registry.as_dict(), indent=2))